@@ -9,20 +9,45 @@ MESSAGES_COUNT=${2:-100}
 
 BUS_TYPE=${3:-redis}
 
+WORKER_REPLICAS=${WORKER_REPLICAS:-1}
+KAFKA_PARTITIONS=${KAFKA_PARTITIONS:-${WORKER_REPLICAS}}  # a partition per worker replica at least
+
 WORK_HARD_TIME=0.0025
+MAX_INFLIGHT=${MAX_INFLIGHT:-1}
+ROUTING=${ROUTING:-random}
+WORK_PROFILE=${WORK_PROFILE:-sleep}
+WORK_EXECUTOR=${WORK_EXECUTOR:-inline}
+PIPELINE=${PIPELINE:-}
 KICK_HARD_TIME=0
+KICK_RATE=${KICK_RATE:-0}
+KICK_RAMP_UP=${KICK_RAMP_UP:-0}
 KICK_START_DELAY=5
 START_DELAY=1
 
+BUS_CODEC=${BUS_CODEC:-json}
+BUS_COMPRESSION=${BUS_COMPRESSION:-none}
+
 DEBUG=${DEBUG:-}
 DRAW_STATS=${DRAW_STATS:-}
 
 #
 if [ "$BUS_TYPE" == "redis" ]; then
+    # worker replicas share their streams through a consumer group
+    if [ "$WORKER_REPLICAS" -gt 1 ]; then
+        BUS_CONNECTION=${BUS_CONNECTION:-'{\"host\": \"redis\", \"port\": \"6379\", \"db\": \"0\", \"group\": \"busride\"}'}
+        if [[ "$BUS_CONNECTION" != *group* ]]; then
+            echo "WORKER_REPLICAS=${WORKER_REPLICAS} needs a \"group\" in the redis BUS_CONNECTION"
+            exit 1
+        fi
+    fi
     BUS_CONNECTION=${BUS_CONNECTION:-'{\"host\": \"redis\", \"port\": \"6379\", \"db\": \"0\"}'}
     BUS_SERVICE=redis
 elif [ $BUS_TYPE == "kafka" ]; then
-    BUS_CONNECTION=${BUS_CONNECTION:-'{\"bootstrap_servers\": \"kafka:9092\"}'}
+    if [ "$KAFKA_PARTITIONS" -lt "$WORKER_REPLICAS" ]; then
+        echo "KAFKA_PARTITIONS=${KAFKA_PARTITIONS} leaves some of the WORKER_REPLICAS=${WORKER_REPLICAS} idle"
+        exit 1
+    fi
+    BUS_CONNECTION=${BUS_CONNECTION:-'{\"bootstrap_servers\": \"kafka:9092\", \"num_partitions\": '${KAFKA_PARTITIONS}'}'}
     BUS_SERVICE=kafka
     KICK_START_DELAY=15
     START_DELAY=19
@@ -31,7 +56,7 @@ elif [ $BUS_TYPE == "pg_table" ]; then
     BUS_SERVICE=psql
     START_DELAY=5
 elif [ $BUS_TYPE == "nats" ]; then
-    BUS_CONNECTION=${BUS_CONNECTION:-'{\"host\": \"nats\", \"port\": \"4222\"}'}
+    BUS_CONNECTION=${BUS_CONNECTION:-'{\"host\": \"nats\", \"port\": \"4222\", \"jetstream\": true}'}
     BUS_SERVICE=nats
 else
     echo "unknown bus type: $BUS_TYPE"
@@ -82,6 +107,7 @@ if [ "$BUS_TYPE" == "nats" ]; then
 
   nats:
     image: ${REDIS_IMAGE:-nats:latest}
+    command: ["-js"]
     networks:
       - busride-network
 
@@ -105,7 +131,7 @@ if [ $BUS_TYPE == "kafka" ]; then
       - KAFKA_LOG4J_LOGGERS=kafka=WARN
       - KAFKA_LOG4J_ROOT_LOGLEVEL=ERROR
       - KAFKA_HEAP_OPTS=-Xmx2G -Xms2G
-      - KAFKA_NUM_PARTITIONS=1
+      - KAFKA_NUM_PARTITIONS=${KAFKA_PARTITIONS}
       - KAFKA_AUTO_CREATE_TOPICS_ENABLE=true
       - KAFKA_OFFSETS_TOPIC_REPLICATION_FACTOR=1
       - KAFKA_TRANSACTION_STATE_LOG_REPLICATION_FACTOR=1
@@ -130,10 +156,16 @@ fi
 
 ### workers
 for sid in $WORKERS_LIST; do
+  if [ "$WORKER_REPLICAS" -gt 1 ]; then
+    WORKER_PLACEMENT="deploy:
+      replicas: ${WORKER_REPLICAS}"
+  else
+    WORKER_PLACEMENT="hostname: ${SERVICE_HOSTNAME:-busride-service-worker}-${sid}"
+  fi
   cat <<EOF
   service-worker-${sid}:
     image: ${SERVICE_IMAGE:-busride-service}
-    hostname: ${SERVICE_HOSTNAME:-busride-service-worker}-${sid}
+    ${WORKER_PLACEMENT}
     depends_on:
       - ${BUS_SERVICE}
       - service-x
@@ -142,9 +174,16 @@ for sid in $WORKERS_LIST; do
       SERVICES_LIST: "${SERVICES_LIST}"
       SERVICE_TYPE: worker
       WORK_HARD_TIME: ${WORK_HARD_TIME}
+      WORK_PROFILE: ${WORK_PROFILE}
+      WORK_EXECUTOR: ${WORK_EXECUTOR}
+      MAX_INFLIGHT: ${MAX_INFLIGHT}
+      ROUTING: ${ROUTING}
+      PIPELINE: ${PIPELINE}
       START_DELAY: ${START_DELAY}
       BUS_TYPE: "${BUS_TYPE}"
       BUS_CONNECTION: "${BUS_CONNECTION}"
+      BUS_CODEC: ${BUS_CODEC}
+      BUS_COMPRESSION: ${BUS_COMPRESSION}
       DEBUG: ${DEBUG}
     networks:
       - busride-network
@@ -168,6 +207,8 @@ cat <<EOF
       EXIT: yes
       BUS_TYPE: "${BUS_TYPE}"
       BUS_CONNECTION: "${BUS_CONNECTION}"
+      BUS_CODEC: ${BUS_CODEC}
+      BUS_COMPRESSION: ${BUS_COMPRESSION}
       DEBUG: ${DEBUG}
       DRAW_STATS: ${DRAW_STATS}
     networks:
@@ -188,10 +229,15 @@ cat <<EOF
       SERVICE_TYPE: kicker
       SERVICES_LIST: "${WORKERS_LIST}"
       KICK_COUNT: ${MESSAGES_COUNT}
+      KICK_RATE: ${KICK_RATE}
+      KICK_RAMP_UP: ${KICK_RAMP_UP}
+      ROUTING: ${ROUTING}
       WORK_HARD_TIME: ${KICK_HARD_TIME}
       START_DELAY: ${KICK_START_DELAY}
       BUS_TYPE: "${BUS_TYPE}"
       BUS_CONNECTION: "${BUS_CONNECTION}"
+      BUS_CODEC: ${BUS_CODEC}
+      BUS_COMPRESSION: ${BUS_COMPRESSION}
       DEBUG: ${DEBUG}
     networks:
       - busride-network
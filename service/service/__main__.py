@@ -4,7 +4,7 @@ import json
 import os
 import socket
 
-from . import service
+from . import service, supervisor
 from .logger import configure_logging, log
 
 
@@ -28,23 +28,123 @@ def read_args() -> argparse.Namespace:
         "--service-type",
         type=str,
         default=os.environ.get("SERVICE_TYPE", "worker"),
-        choices=["kicker", "worker", "catcher"],
+        choices=["kicker", "worker", "catcher", "ride"],
     )
     parser.add_argument(
         "--work-hard-time",
         type=float,
         default=float(os.environ.get("WORK_HARD_TIME", "0.05")),
     )
+    parser.add_argument(
+        "--work-profile",
+        type=str,
+        default=os.environ.get("WORK_PROFILE", "sleep"),
+        choices=["sleep", "hash", "compress", "json"],
+    )
+    parser.add_argument(
+        "--work-executor",
+        type=str,
+        default=os.environ.get("WORK_EXECUTOR", "inline"),
+        choices=["inline", "thread", "process"],
+    )
+    parser.add_argument(
+        "--work-pool-size",
+        type=int,
+        default=int(os.environ.get("WORK_POOL_SIZE", "0")),
+    )
     parser.add_argument(
         "--kick-count",
         type=int,
         default=int(os.environ.get("KICK_COUNT", "0")),
     )
+    parser.add_argument(
+        "--kick-rate",
+        type=float,
+        default=float(os.environ.get("KICK_RATE", "0")),
+    )
+    parser.add_argument(
+        "--kick-chunk",
+        type=int,
+        default=int(os.environ.get("KICK_CHUNK", "100")),
+    )
+    parser.add_argument(
+        "--kick-ramp-up",
+        type=float,
+        default=float(os.environ.get("KICK_RAMP_UP", "0")),
+    )
+    parser.add_argument(
+        "--kick-duration",
+        type=float,
+        default=float(os.environ.get("KICK_DURATION", "0")),
+    )
     parser.add_argument(
         "--catch-count",
         type=int,
         default=int(os.environ.get("CATCH_COUNT", "0")),
     )
+    parser.add_argument(
+        "--workers-count",
+        type=int,
+        default=int(os.environ.get("WORKERS_COUNT", "3")),
+    )
+    parser.add_argument(
+        "--max-inflight",
+        type=int,
+        default=int(os.environ.get("MAX_INFLIGHT", "1")),
+    )
+    parser.add_argument(
+        "--inflight-order",
+        type=str,
+        default=os.environ.get("INFLIGHT_ORDER", "ordered"),
+        choices=["ordered", "completed"],
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        default=bool(os.environ.get("PIPELINE", "")),
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        default=int(os.environ.get("PIPELINE_DEPTH", "4")),
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=int(os.environ.get("PROCESSES", "1")),
+    )
+    parser.add_argument(
+        "--process-ids",
+        type=str,
+        default=os.environ.get("PROCESS_IDS", "same"),
+        choices=["same", "derived"],
+    )
+    parser.add_argument(
+        "--latency-tail",
+        type=int,
+        default=int(os.environ.get("LATENCY_TAIL", "32")),
+    )
+    parser.add_argument(
+        "--routing",
+        type=str,
+        default=os.environ.get("ROUTING", "random"),
+        choices=["random", "weighted", "hash", "p2c", "topology"],
+    )
+    parser.add_argument(
+        "--routing-weights",
+        type=str,
+        default=os.environ.get("ROUTING_WEIGHTS", ""),
+    )
+    parser.add_argument(
+        "--routing-topology",
+        type=str,
+        default=os.environ.get("ROUTING_TOPOLOGY", ""),
+    )
+    parser.add_argument(
+        "--route-tail",
+        type=int,
+        default=int(os.environ.get("ROUTE_TAIL", "0")),
+    )
     parser.add_argument(
         "--exit",
         action="store_true",
@@ -59,7 +159,7 @@ def read_args() -> argparse.Namespace:
         "--bus-type",
         type=str,
         default=os.environ.get("BUS_TYPE", "dummy"),
-        choices=["redis", "kafka", "dummy", "pg_table"],
+        choices=["redis", "kafka", "dummy", "pg_table", "nats", "memory", "shm"],
     )
     parser.add_argument(
         "--bus-connection",
@@ -69,6 +169,23 @@ def read_args() -> argparse.Namespace:
             '{"host": "localhost", "port": 6379, "db": 0}',
         ),
     )
+    parser.add_argument(
+        "--bus-codec",
+        type=str,
+        default=os.environ.get("BUS_CODEC", "json"),
+        choices=["json", "orjson", "msgpack"],
+    )
+    parser.add_argument(
+        "--bus-compression",
+        type=str,
+        default=os.environ.get("BUS_COMPRESSION", "none"),
+        choices=["none", "zlib", "zstd", "lz4"],
+    )
+    parser.add_argument(
+        "--bus-compress-min-size",
+        type=int,
+        default=int(os.environ.get("BUS_COMPRESS_MIN_SIZE", "512")),
+    )
     parser.add_argument(
         "--debug",
         action="store_true",
@@ -105,6 +222,9 @@ def main() -> None:
         "Starting service with args: %s",
         "; ".join((f"{k}={v!s:.32s}" for k, v in config._get_kwargs())),
     )
+    if config.processes > 1:
+        supervisor.Supervisor(config).run()
+        return
     asyncio.run(forest_run(config))
 
 
@@ -1,4 +1,5 @@
 from .bus import BusDriver, BusDriverFactory, BusMessage  # noqa
+from .codec import Codec, CodecFactory, get_codec  # noqa
 
 
 def get_bus_driver(
@@ -1,38 +1,109 @@
 import abc
-import dataclasses
-from collections import defaultdict
+from collections import Counter, defaultdict
+from collections.abc import Callable
+
+from .codec import Codec, JsonCodec, get_codec
+from .compress import Compressor, get_compressor
 
 
-@dataclasses.dataclass
 class BusMessage:
-    data: dict
-    rcpt: str | int | None = None
-    sender: str | int | None = None
-    msg_id: str | int | None = None
+    """
+    Bus message.
+
+    Received messages keep their raw wire payload and decode it on first access
+    (then cache it); a message forwarded untouched is re-sent as raw bytes.
+    `datas()` is the data itself (a `defaultdict(str)`), so it can be updated
+    and sent on without copying.
+    `received_ns` is the wall clock (ns) when the service took the message off the bus.
+    """
+
+    __slots__ = ("_data", "_decoder", "_msg_id", "_raw", "rcpt", "received_ns", "sender")
+
+    def __init__(
+        self,
+        data: dict | None = None,
+        rcpt: str | int | None = None,
+        sender: str | int | None = None,
+        msg_id: str | int | None = None,
+        raw: bytes | None = None,
+        decoder: Callable[[bytes], dict] | None = None,
+    ) -> None:
+        self._data = data
+        self._raw = raw
+        self._decoder = decoder
+        self._msg_id = msg_id
+        self.rcpt = rcpt
+        self.sender = sender
+        self.received_ns: int | None = None
+
+    @classmethod
+    def from_raw(
+        cls,
+        raw: bytes,
+        decoder: Callable[[bytes], dict],
+        rcpt: str | int | None = None,
+        sender: str | int | None = None,
+        msg_id: str | int | None = None,
+    ) -> "BusMessage":
+        return cls(rcpt=rcpt, sender=sender, msg_id=msg_id, raw=raw, decoder=decoder)
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = self._decoder(self._raw) if self._raw is not None else {}
+            self._raw = self._decoder = None
+        return self._data
+
+    @data.setter
+    def data(self, data: dict) -> None:
+        self._data = data
+        self._raw = self._decoder = None
+
+    @property
+    def raw(self) -> bytes | None:
+        """The wire payload, while the data has not been decoded."""
+        return self._raw
+
+    @property
+    def msg_id(self) -> str | int | None:
+        if self._msg_id is None:
+            return self.data.get("id")
+        return self._msg_id
+
+    @msg_id.setter
+    def msg_id(self, msg_id: str | int | None) -> None:
+        self._msg_id = msg_id
 
     def datas(self) -> dict:
-        datas = defaultdict(str)
-        for key, value in self.data.items():
-            if isinstance(key, bytes):
-                key = key.decode("utf-8")
-            if isinstance(value, bytes):
-                datas[key] = value.decode("utf-8")
-            elif not isinstance(value, str):
-                datas[key] = str(value)
-            else:
-                datas[key] = value
-        return datas
+        data = self.data
+        if not isinstance(data, defaultdict):
+            data = self._data = defaultdict(str, data)
+        return data
+
+    def __repr__(self) -> str:
+        data = f"<{len(self._raw)} raw bytes>" if self._data is None and self._raw is not None else self._data
+        return (
+            f"BusMessage(rcpt={self.rcpt!r}, sender={self.sender!r}, msg_id={self._msg_id!r}, data={data!r})"
+        )
 
 
 class BusDriver(abc.ABC):
 
+    RAW_TAG = b"\x00"
+    COMPRESS_MIN_SIZE = 512  # bytes
+
+    codec: Codec = JsonCodec()
+    compressor: Compressor | None = None
+    compress_min_size: int = COMPRESS_MIN_SIZE
+    traffic: Counter | None = None
+
     @abc.abstractmethod
     def __init__(self, *args: tuple, **kwargs: dict) -> None:
         pass
 
     @abc.abstractmethod
-    async def send(self, messages: list[BusMessage]) -> None:
-        pass
+    async def send(self, messages: list[BusMessage]) -> list[BusMessage] | None:
+        """Sends messages, may return the ones that failed."""
 
     @abc.abstractmethod
     async def receive(self, stream_name: str, *args: tuple, **kwargs: dict) -> list[BusMessage] | None:
@@ -44,6 +115,73 @@ class BusDriver(abc.ABC):
     async def stop(self) -> None:
         return
 
+    async def ack(self, stream_name: str, messages: list[BusMessage]) -> None:
+        """Acknowledges messages received with `ack=False`, once they are handled."""
+        return
+
+    async def backlog(self, streams: list[str]) -> dict[str, int]:
+        """Messages waiting per stream, as far as the bus can tell (empty if it cannot)."""
+        return {}
+
+    async def stats(self) -> dict:
+        """Driver and backend counters: the wire traffic, plus what the backend reports."""
+        return dict(self.traffic or {})
+
+    def setup_wire(
+        self,
+        codec: str | Codec = "json",
+        compression: str | None = None,
+        compress_min_size: int = COMPRESS_MIN_SIZE,
+    ) -> None:
+        """
+        Sets up the wire format: codec, optional compression above `compress_min_size`
+        (a one-byte tag then tells compressed and raw payloads apart), byte accounting.
+        """
+        self.codec = get_codec(codec)
+        self.compressor = get_compressor(compression)
+        self.compress_min_size = int(compress_min_size)
+        self.traffic = Counter()
+
+    def encode(self, data: dict) -> bytes:
+        raw = self.codec.encode(data)
+        wire = raw
+        if self.compressor:
+            wire = self.RAW_TAG + raw
+            if len(raw) >= self.compress_min_size:
+                compressed = self.compressor.tag + self.compressor.compress(raw)
+                if len(compressed) < len(wire):
+                    wire = compressed
+        if self.traffic is not None:
+            self.traffic.update(sent_messages=1, sent_raw_bytes=len(raw), sent_wire_bytes=len(wire))
+        return wire
+
+    def encode_message(self, message: BusMessage) -> bytes:
+        """
+        Encodes message data, an undecoded message goes on as it came:
+        its raw size is unknown, so it stays out of the byte counters (the ratio holds).
+        """
+        if message.raw is not None:
+            if self.traffic is not None:
+                self.traffic.update(sent_messages=1, sent_passthrough_messages=1)
+            return bytes(message.raw)
+        return self.encode(message.data)
+
+    def decode(self, wire: bytes | memoryview) -> dict:
+        raw = wire
+        if self.compressor:
+            tag, payload = bytes(wire[:1]), memoryview(wire)[1:]
+            if tag == self.RAW_TAG:
+                raw = payload
+            elif tag == self.compressor.tag:
+                raw = self.compressor.decompress(payload)
+            else:
+                raise ValueError(f"unexpected payload tag: {tag!r}")
+        if self.traffic is not None:
+            self.traffic.update(
+                received_messages=1, received_raw_bytes=len(raw), received_wire_bytes=len(wire)
+            )
+        return self.codec.decode(raw)
+
 
 class BusDriverFactory:
 
@@ -0,0 +1,87 @@
+import abc
+import json
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+
+class Codec(abc.ABC):
+    """
+    Wire codec: message data dict ⇄ bytes, keeping value types.
+    """
+
+    @abc.abstractmethod
+    def encode(self, data: dict) -> bytes:
+        pass
+
+    @abc.abstractmethod
+    def decode(self, raw: bytes | memoryview) -> dict:
+        pass
+
+
+class JsonCodec(Codec):
+
+    def encode(self, data: dict) -> bytes:
+        return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, raw: bytes | memoryview) -> dict:
+        return json.loads(str(raw, "utf-8"))
+
+
+class OrjsonCodec(Codec):
+
+    def __init__(self) -> None:
+        if orjson is None:
+            raise ValueError("Codec 'orjson' requires the `orjson` package.")
+
+    def encode(self, data: dict) -> bytes:
+        return orjson.dumps(data)
+
+    def decode(self, raw: bytes | memoryview) -> dict:
+        return orjson.loads(raw)
+
+
+class MsgpackCodec(Codec):
+
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise ValueError("Codec 'msgpack' requires the `msgpack` package.")
+
+    def encode(self, data: dict) -> bytes:
+        return msgpack.packb(data, use_bin_type=True)
+
+    def decode(self, raw: bytes | memoryview) -> dict:
+        return msgpack.unpackb(raw, raw=False)
+
+
+class CodecFactory:
+
+    registry: dict[str, type[Codec]] = {}
+
+    @classmethod
+    def register(cls, name: str, codec_cls: type[Codec]) -> None:
+        cls.registry[name] = codec_cls
+
+    @classmethod
+    def create(cls, name: str) -> Codec:
+        if name not in cls.registry:
+            raise ValueError(f"Codec '{name}' not registered.")
+        return cls.registry[name]()
+
+
+CodecFactory.register("json", JsonCodec)
+CodecFactory.register("orjson", OrjsonCodec)
+CodecFactory.register("msgpack", MsgpackCodec)
+
+
+def get_codec(name: str | Codec = "json") -> Codec:
+    if isinstance(name, Codec):
+        return name
+    return CodecFactory.create(name)
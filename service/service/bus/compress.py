@@ -0,0 +1,100 @@
+import abc
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:  # optional
+    lz4 = None
+
+
+class Compressor(abc.ABC):
+    """
+    Payload compressor, identified on the wire by a one-byte tag.
+    """
+
+    tag: bytes = b""
+
+    @abc.abstractmethod
+    def compress(self, raw: bytes) -> bytes:
+        pass
+
+    @abc.abstractmethod
+    def decompress(self, wire: bytes | memoryview) -> bytes:
+        pass
+
+
+class ZlibCompressor(Compressor):
+
+    tag = b"z"
+
+    def __init__(self, level: int = 1) -> None:
+        self.level = level
+
+    def compress(self, raw: bytes) -> bytes:
+        return zlib.compress(raw, self.level)
+
+    def decompress(self, wire: bytes | memoryview) -> bytes:
+        return zlib.decompress(wire)
+
+
+class ZstdCompressor(Compressor):
+
+    tag = b"s"
+
+    def __init__(self, level: int = 3) -> None:
+        if zstandard is None:
+            raise ValueError("Compression 'zstd' requires the `zstandard` package.")
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, raw: bytes) -> bytes:
+        return self._compressor.compress(raw)
+
+    def decompress(self, wire: bytes | memoryview) -> bytes:
+        return self._decompressor.decompress(wire)
+
+
+class Lz4Compressor(Compressor):
+
+    tag = b"4"
+
+    def __init__(self) -> None:
+        if lz4 is None:
+            raise ValueError("Compression 'lz4' requires the `lz4` package.")
+
+    def compress(self, raw: bytes) -> bytes:
+        return lz4.frame.compress(raw)
+
+    def decompress(self, wire: bytes | memoryview) -> bytes:
+        return lz4.frame.decompress(wire)
+
+
+class CompressorFactory:
+
+    registry: dict[str, type[Compressor]] = {}
+
+    @classmethod
+    def register(cls, name: str, compressor_cls: type[Compressor]) -> None:
+        cls.registry[name] = compressor_cls
+
+    @classmethod
+    def create(cls, name: str) -> Compressor:
+        if name not in cls.registry:
+            raise ValueError(f"Compression '{name}' not registered.")
+        return cls.registry[name]()
+
+
+CompressorFactory.register("zlib", ZlibCompressor)
+CompressorFactory.register("zstd", ZstdCompressor)
+CompressorFactory.register("lz4", Lz4Compressor)
+
+
+def get_compressor(name: str | None) -> Compressor | None:
+    if not name or name == "none":
+        return None
+    return CompressorFactory.create(name)
@@ -11,10 +11,10 @@ class DummyBusDriver(BusDriver):
     def __init__(self, *args: tuple, **kwargs: dict) -> None:
         pass
 
-    def send(self, messages: list[dict]) -> None:
+    async def send(self, messages: list[dict]) -> None:
         pass
 
-    def receive(self, stream_id: str | None = None) -> list[dict] | None:
+    async def receive(self, stream_id: str | None = None, *args: tuple, **kwargs: dict) -> list[dict] | None:
         return []
 
 
@@ -1,7 +1,10 @@
-import json
+import asyncio
+import socket
 
 import aiokafka
+import aiokafka.admin
 import aiokafka.errors
+import aiokafka.partitioner
 
 from ..helpers import async_try_ignore
 from ..logger import log
@@ -13,23 +16,70 @@ class KafkaBusDriver(BusDriver):
     Kafka bus driver.
 
     This driver uses Kafka to send and receive messages.
+    Send modes:
+    - `wait`: send_and_wait, one broker round trip per message
+    - `futures`: enqueue the whole batch with send(), then gather the delivery futures once
+    - `batch`: build record batches per topic with create_batch/send_batch
+    Every service id reads through its own consumer group (unless `group_id` is given),
+    so workers joining or leaving do not rebalance the other stops;
+    `static_membership` (or an explicit `group_instance_id`) avoids rebalances on restarts,
+    the instance id derives from the host name (and `instance_tag`, the supervisor's child index).
+    Messages are keyed by `msg_id`, so with `num_partitions` > 1 replicas of one service id
+    split the topic partitions within the group, keeping per-key order.
+    The backlog of a stream is its group lag: end offsets minus committed ones.
+    Without auto-commit (`auto_commit_interval` 0), a batch received with `ack=False`
+    is committed by `ack()` rather than right away.
     """
 
     TOPIC_PREFIX = "t."
+    GROUP_PREFIX = "g."
     AUTO_COMMIT_INTERVAL = 5000  # ms
+    SEND_MODES = ("wait", "futures", "batch")
 
     def __init__(
         self,
         bootstrap_servers: str = "kafka:9092",
-        group_id: str = "default-group",
+        group_id: str | None = None,
+        group_instance_id: str | None = None,
+        static_membership: bool = False,
+        instance_tag: str | None = None,
+        auto_commit_interval: int = AUTO_COMMIT_INTERVAL,
+        send_mode: str = "futures",
+        compression_type: str | None = None,
+        linger_ms: int = 10,
+        batch_size: int = 16384,
+        acks: int | str = 0,
+        num_partitions: int = 0,
+        codec: str = "json",
+        compression: str | None = None,
+        compress_min_size: int = BusDriver.COMPRESS_MIN_SIZE,
         *args: tuple,
         **kwargs: dict,
     ) -> None:
+        self.setup_wire(codec, compression, compress_min_size)
+        if send_mode not in self.SEND_MODES:
+            raise ValueError(f"Unknown kafka send mode: {send_mode}")
         self.bootstrap_servers = bootstrap_servers
         self.group_id = group_id
+        self.group_instance_id = group_instance_id
+        self.static_membership = bool(static_membership)
+        self.instance_tag = instance_tag
+        self.auto_commit_interval = int(auto_commit_interval)
+        self.send_mode = send_mode
+        self.compression_type = compression_type
+        self.linger_ms = int(linger_ms)
+        self.batch_size = int(batch_size)
+        self.acks = int(acks) if str(acks).lstrip("-").isdigit() else acks
+        self.num_partitions = int(num_partitions)
+        self.partitioner = aiokafka.partitioner.DefaultPartitioner()
         self._producer = None
         self._consumer = None
+        self._admin = None
+        self._offsets_consumer = None
         self._subscribed_to = None
+        self._topics = set()
+        self._partitions: dict[str, list[aiokafka.TopicPartition]] = {}
+        self._unacked: dict[int, tuple[aiokafka.TopicPartition, int]] = {}  # by id() of the bus message
 
     @property
     def producer(self) -> aiokafka.AIOKafkaProducer:
@@ -37,51 +87,255 @@ class KafkaBusDriver(BusDriver):
             self._producer = aiokafka.AIOKafkaProducer(
                 bootstrap_servers=self.bootstrap_servers,
                 client_id="bus-driver",
-                linger_ms=10,
-                acks=0,
+                compression_type=self.compression_type,
+                linger_ms=self.linger_ms,
+                max_batch_size=self.batch_size,
+                acks=self.acks,
             )
         return self._producer
 
     @property
-    def consumer(self) -> aiokafka.AIOKafkaConsumer:
-        if not self._consumer:
-            self._consumer = aiokafka.AIOKafkaConsumer(
-                bootstrap_servers=self.bootstrap_servers,
-                group_id=self.group_id,
-                client_id="bus-driver",
-                auto_offset_reset="earliest",
-                enable_auto_commit=self.AUTO_COMMIT_INTERVAL > 0,
-                auto_commit_interval_ms=self.AUTO_COMMIT_INTERVAL,
-                session_timeout_ms=90000,  # here goes some magic numbers
-                consumer_timeout_ms=100,
-                max_poll_records=1024,
-                retry_backoff_ms=1000,
-            )
+    def consumer(self) -> aiokafka.AIOKafkaConsumer | None:
         return self._consumer
 
+    def create_consumer(
+        self, topic: str, group_id: str, group_instance_id: str | None
+    ) -> aiokafka.AIOKafkaConsumer:
+        return aiokafka.AIOKafkaConsumer(
+            topic,
+            bootstrap_servers=self.bootstrap_servers,
+            group_id=group_id,
+            group_instance_id=group_instance_id,
+            client_id="bus-driver",
+            auto_offset_reset="earliest",
+            enable_auto_commit=self.auto_commit_interval > 0,
+            auto_commit_interval_ms=self.auto_commit_interval or self.AUTO_COMMIT_INTERVAL,
+            session_timeout_ms=90000,  # here goes some magic numbers
+            consumer_timeout_ms=100,
+            max_poll_records=1024,
+            retry_backoff_ms=1000,
+        )
+
     async def start(self) -> None:
         await self.producer.start()
-        await self.consumer.start()
+        if self.num_partitions > 0:
+            await self.admin()
 
     async def stop(self) -> None:
         await self.producer.stop()
-        await self.consumer.stop()
+        if self._admin:
+            await self._admin.close()
+            self._admin = None
+        if self._offsets_consumer:
+            await self._offsets_consumer.stop()
+            self._offsets_consumer = None
+        if self._consumer:
+            await self._consumer.stop()
+            self._consumer = None
+            self._subscribed_to = None
+
+    async def ensure_topic(self, topic: str) -> None:
+        """Creates the topic with `num_partitions` (if set) before its first use."""
+        if topic in self._topics:
+            return
+        self._topics.add(topic)
+        if self.num_partitions <= 0:
+            return
+        try:
+            await (await self.admin()).create_topics(
+                [aiokafka.admin.NewTopic(topic, num_partitions=self.num_partitions, replication_factor=1)]
+            )
+            log.info("created topic: %s ×%s", topic, self.num_partitions)
+        except aiokafka.errors.TopicAlreadyExistsError:
+            pass
+        except aiokafka.errors.KafkaError as e:
+            log.warning("kafka create topic `%s`: %s", topic, e)
+
+    async def admin(self) -> aiokafka.admin.AIOKafkaAdminClient:
+        if not self._admin:
+            self._admin = aiokafka.admin.AIOKafkaAdminClient(bootstrap_servers=self.bootstrap_servers)
+            await self._admin.start()
+        return self._admin
+
+    async def offsets_consumer(self) -> aiokafka.AIOKafkaConsumer:
+        """A group-less consumer, only to look up partition end offsets."""
+        if not self._offsets_consumer:
+            self._offsets_consumer = aiokafka.AIOKafkaConsumer(
+                bootstrap_servers=self.bootstrap_servers,
+                client_id="bus-driver-offsets",
+                enable_auto_commit=False,
+            )
+            await self._offsets_consumer.start()
+        return self._offsets_consumer
+
+    def group(self, stream_name: str) -> str:
+        return self.group_id or f"{self.GROUP_PREFIX}{stream_name}"
+
+    def known_partitions(self, topic: str) -> list[aiokafka.TopicPartition]:
+        """
+        Partitions of the topic from the producer's cached metadata, without a broker round trip;
+        an unknown topic is only added to the tracked ones (known after the next metadata update).
+        """
+        if topic not in self._partitions:
+            partitions = self.producer.client.cluster.partitions_for_topic(topic)
+            if not partitions:
+                self.producer.client.add_topic(topic)
+                return []
+            self._partitions[topic] = [aiokafka.TopicPartition(topic, p) for p in sorted(partitions)]
+        return self._partitions[topic]
+
+    async def backlog(self, streams: list[str]) -> dict[str, int]:
+        """
+        Consumer group lag per stream: end offsets of all the partitions in one request,
+        committed offsets of the groups fetched concurrently (one request if `group_id` is shared);
+        a partition without a commit lags from its beginning, topics not known yet are skipped.
+        """
+        partitions = {stream_name: self.known_partitions(self.topic(stream_name)) for stream_name in streams}
+        partitions = {stream_name: tps for stream_name, tps in partitions.items() if tps}
+        if not partitions:
+            return {}
+
+        groups = {}
+        for stream_name, tps in partitions.items():
+            groups.setdefault(self.group(stream_name), []).extend(tps)
+
+        try:
+            consumer, admin = await self.offsets_consumer(), await self.admin()
+            end_offsets, *committed = await asyncio.gather(
+                consumer.end_offsets([tp for tps in partitions.values() for tp in tps]),
+                *(admin.list_consumer_group_offsets(group, partitions=tps) for group, tps in groups.items()),
+            )
+            committed = dict(zip(groups, committed, strict=True))
+            uncommitted = [
+                tp
+                for stream_name, tps in partitions.items()
+                for tp in tps
+                if tp not in committed[self.group(stream_name)]
+                or committed[self.group(stream_name)][tp].offset < 0
+            ]
+            beginning_offsets = await consumer.beginning_offsets(uncommitted) if uncommitted else {}
+        except aiokafka.errors.KafkaError as e:
+            log.warning("kafka backlog: %s", e)
+            return {}
+
+        backlog = {}
+        for stream_name, tps in partitions.items():
+            group_offsets, lag = committed[self.group(stream_name)], 0
+            for tp in tps:
+                start = beginning_offsets[tp] if tp in beginning_offsets else group_offsets[tp].offset
+                lag += max(0, end_offsets[tp] - start)
+            backlog[stream_name] = lag
+        return backlog
+
+    async def stats(self) -> dict:
+        stats = await super().stats()
+        if self._consumer and self._subscribed_to:
+            stats["topic"] = self._subscribed_to
+            stats["assigned_partitions"] = len(self._consumer.assignment())
+            stats["lag"] = sum((await self.backlog([self._subscribed_to[len(self.TOPIC_PREFIX) :]])).values())
+        return stats
 
     @async_try_ignore(fb=None)
-    async def send(self, messages: list[BusMessage]) -> None:
+    async def send(self, messages: list[BusMessage]) -> list[BusMessage]:
+        for topic in {self.topic(msg.rcpt) for msg in messages}:
+            await self.ensure_topic(topic)
+        if self.send_mode == "wait":
+            return await self._send_and_wait(messages)
+        if self.send_mode == "batch":
+            return await self._send_batches(messages)
+        return await self._send_futures(messages)
+
+    async def _send_and_wait(self, messages: list[BusMessage]) -> list[BusMessage]:
+        failed = []
         for msg in messages:
             log.debug("sending message: %s", msg)
-            topic = f"{self.TOPIC_PREFIX}{msg.rcpt}"
             try:
-                data = json.dumps(msg.data).encode("utf-8")
                 rc = await self.producer.send_and_wait(
-                    topic=topic,
-                    value=data,
-                    key=str(msg.msg_id).encode("utf-8") if msg.msg_id else None,
+                    topic=self.topic(msg.rcpt),
+                    value=self.encode_message(msg),
+                    key=self.key(msg),
                 )
                 log.debug("kafka produce result: %s", rc)
             except aiokafka.errors.KafkaError as e:
                 log.error("kafka produce: %s", e)
+                failed.append(msg)
+        return failed
+
+    async def _send_futures(self, messages: list[BusMessage]) -> list[BusMessage]:
+        futures = []
+        for msg in messages:
+            log.debug("sending message: %s", msg)
+            futures.append(
+                await self.producer.send(
+                    topic=self.topic(msg.rcpt),
+                    value=self.encode_message(msg),
+                    key=self.key(msg),
+                )
+            )
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        return self._failed(messages, results)
+
+    async def _send_batches(self, messages: list[BusMessage]) -> list[BusMessage]:
+        partitions = {}
+        for topic in {self.topic(msg.rcpt) for msg in messages}:
+            partitions[topic] = sorted(await self.producer.partitions_for(topic))
+
+        batches = {}
+        for msg in messages:
+            topic = self.topic(msg.rcpt)
+            partition = self.partitioner(self.key(msg), partitions[topic], None)
+            batches.setdefault((topic, partition), []).append(msg)
+
+        futures, batched = [], []
+        for (topic, partition), topic_messages in batches.items():
+            batch, in_batch = self.producer.create_batch(), []
+            for msg in topic_messages:
+                log.debug("sending message: %s", msg)
+                value, key = self.encode_message(msg), self.key(msg)
+                if batch.append(key=key, value=value, timestamp=None) is None:
+                    futures.append(await self.producer.send_batch(batch, topic, partition=partition))
+                    batched.append(in_batch)
+                    batch, in_batch = self.producer.create_batch(), []
+                    batch.append(key=key, value=value, timestamp=None)
+                in_batch.append(msg)
+            if in_batch:
+                futures.append(await self.producer.send_batch(batch, topic, partition=partition))
+                batched.append(in_batch)
+
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        failed = []
+        for in_batch, result in zip(batched, results, strict=True):
+            if isinstance(result, Exception):
+                log.error("kafka produce batch (%s messages): %s", len(in_batch), result)
+                failed.extend(in_batch)
+        return failed
+
+    def _failed(self, messages: list[BusMessage], results: list) -> list[BusMessage]:
+        failed = []
+        for msg, result in zip(messages, results, strict=True):
+            if isinstance(result, Exception):
+                log.error("kafka produce: %s", result)
+                failed.append(msg)
+        return failed
+
+    async def ack(self, stream_name: str, messages: list[BusMessage]) -> None:
+        offsets = {}
+        for bmsg in messages:
+            topic_part, offset = self._unacked.pop(id(bmsg), (None, None))
+            if topic_part is not None:
+                offsets[topic_part] = max(offsets.get(topic_part, 0), offset + 1)
+        if offsets and self.consumer:
+            try:
+                await self.consumer.commit(offsets)
+            except aiokafka.errors.KafkaError as e:
+                log.error("kafka commit: %s", e)
+
+    def topic(self, rcpt: str | int | None) -> str:
+        return f"{self.TOPIC_PREFIX}{rcpt}"
+
+    @staticmethod
+    def key(msg: BusMessage) -> bytes | None:
+        return str(msg.msg_id).encode("utf-8") if msg.msg_id else None
 
     @async_try_ignore(fb=None)
     async def receive(
@@ -89,14 +343,15 @@ class KafkaBusDriver(BusDriver):
         stream_name: str,
         count: int = 1024,
         timeout: float = 0.05,
+        ack: bool = True,
         *args: tuple,
         **kwargs: dict,
     ) -> list[BusMessage] | None:
 
         await self.consumer_subscribe(stream_name)
+        defer = not ack and not self.auto_commit_interval
 
         messages = []
-        topic_part = aiokafka.TopicPartition(f"{self.TOPIC_PREFIX}{stream_name}", 0)
         try:
             result = await self.consumer.getmany(timeout_ms=int(timeout * 1000), max_records=count)
             for topic_part, top_messages in result.items():
@@ -105,13 +360,18 @@ class KafkaBusDriver(BusDriver):
                     if msg is None:
                         continue
                     log.debug("msg: %s %s", msg.key, msg.value)
-                    data = json.loads(msg.value.decode("utf-8"))
-                    bmsg = BusMessage(data=data, msg_id=msg.key.decode("utf-8") if msg.key else None)
+                    bmsg = BusMessage.from_raw(
+                        msg.value,
+                        self.decode,
+                        msg_id=msg.key.decode("utf-8") if msg.key else None,
+                    )
                     messages.append(bmsg)
-                    if not self.AUTO_COMMIT_INTERVAL:
-                        await self.consumer.commit()
+                    if defer:
+                        self._unacked[id(bmsg)] = (topic_part, msg.offset)
                     if len(messages) >= count:
                         break
+            if messages and not self.auto_commit_interval and not defer:
+                await self.consumer.commit()
         except aiokafka.errors.KafkaError as e:
             log.error("kafka consume: %s", e)
         except TimeoutError:
@@ -120,11 +380,22 @@ class KafkaBusDriver(BusDriver):
         return messages
 
     async def consumer_subscribe(self, stream_name: str) -> None:
-        topic = f"{self.TOPIC_PREFIX}{stream_name}"
-        if self._subscribed_to != topic:
-            log.info("subscribing to topic: %s", topic)
-            self.consumer.subscribe([topic])
-            self._subscribed_to = topic
+        topic = self.topic(stream_name)
+        if self._subscribed_to == topic:
+            return
+        if self._consumer:
+            await self._consumer.stop()
+        group_id = self.group(stream_name)
+        group_instance_id = self.group_instance_id
+        if group_instance_id is None and self.static_membership:
+            group_instance_id = f"{group_id}.{socket.gethostname()}"
+            if self.instance_tag is not None:
+                group_instance_id = f"{group_instance_id}.{self.instance_tag}"
+        await self.ensure_topic(topic)
+        log.info("subscribing to topic: %s (group=%s, instance=%s)", topic, group_id, group_instance_id)
+        self._consumer = self.create_consumer(topic, group_id, group_instance_id)
+        await self._consumer.start()
+        self._subscribed_to = topic
 
 
 BusDriverFactory.register("kafka", KafkaBusDriver)
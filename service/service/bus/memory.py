@@ -0,0 +1,81 @@
+import asyncio
+
+from ..logger import log
+from .bus import BusDriver, BusDriverFactory, BusMessage
+
+
+class MemoryBusDriver(BusDriver):
+    """
+    In-process memory bus driver.
+
+    This driver keeps a bounded asyncio queue per recipient,
+    shared by all the drivers living in the same process (and event loop).
+    A full queue blocks the sender (backpressure), so keep `maxsize`
+    above the number of messages on the ride to avoid send-send cycles.
+    Message data still goes through the codec, as it would on a real bus.
+    """
+
+    QUEUE_MAXSIZE = 10240
+
+    queues: dict[str, asyncio.Queue] = {}
+
+    def __init__(
+        self,
+        maxsize: int = QUEUE_MAXSIZE,
+        codec: str = "json",
+        compression: str | None = None,
+        compress_min_size: int = BusDriver.COMPRESS_MIN_SIZE,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> None:
+        self.maxsize = int(maxsize)
+        self.setup_wire(codec, compression, compress_min_size)
+
+    def queue(self, name: str | int | None) -> asyncio.Queue:
+        name = str(name)
+        if name not in self.queues:
+            self.queues[name] = asyncio.Queue(maxsize=self.maxsize)
+        return self.queues[name]
+
+    async def backlog(self, streams: list[str]) -> dict[str, int]:
+        return {stream: self.queue(stream).qsize() for stream in streams}
+
+    async def stats(self) -> dict:
+        return {
+            **await super().stats(),
+            "queues": len(self.queues),
+            "queued": sum(queue.qsize() for queue in self.queues.values()),
+        }
+
+    async def send(self, messages: list[BusMessage]) -> None:
+        for message in messages:
+            log.debug("sending message: %s", message)
+            await self.queue(message.rcpt).put((message.sender, self.encode_message(message)))
+
+    async def receive(
+        self,
+        stream_name: str,
+        count: int = 100,
+        timeout: float = 0.5,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> list[BusMessage] | None:
+
+        queue = self.queue(stream_name)
+        try:
+            items = [await asyncio.wait_for(queue.get(), timeout)]
+        except TimeoutError:
+            return []
+
+        while len(items) < count and not queue.empty():
+            items.append(queue.get_nowait())
+
+        messages = []
+        for sender, raw in items:
+            messages.append(BusMessage.from_raw(raw, self.decode, rcpt=stream_name, sender=sender))
+
+        log.debug("got %s messages from `%s`", len(messages), stream_name)
+        return messages
+
+
+BusDriverFactory.register("memory", MemoryBusDriver)
@@ -1,7 +1,10 @@
-import json
 import time
 
 import nats
+import nats.aio.msg
+import nats.errors
+import nats.js.api
+import nats.js.errors
 
 from ..helpers import async_try_ignore
 from ..logger import log
@@ -13,25 +16,39 @@ class NatsBusDriver(BusDriver):
     NATS bus driver.
 
     This driver uses NATS to send and receive messages.
+    With `jetstream` set, messages are persisted in a work-queue stream
+    and read by a durable pull consumer per service id, in batches;
+    received with `ack=False`, they are acknowledged by `ack()` instead of on fetch.
     """
 
     STREAM_NAME = "bus"
     MESSAGE_SUBJECT_PREFIX = "s"
+    DURABLE_PREFIX = "d"
 
     def __init__(
         self,
         host: str = "localhost",
         port: int = 4222,
+        jetstream: bool = False,
+        codec: str = "json",
+        compression: str | None = None,
+        compress_min_size: int = BusDriver.COMPRESS_MIN_SIZE,
         *args: tuple,
         **kwargs: dict,
     ) -> None:
+        self.setup_wire(codec, compression, compress_min_size)
         self.servers = f"nats://{host}:{port}"
+        self.jetstream = bool(jetstream)
         self.nc = None
+        self.js = None
         self._subscribed_to = None
         self._sub = None
+        self._unacked: dict[int, nats.aio.msg.Msg] = {}  # by id() of the bus message
 
     async def start(self) -> None:
         await self._connect()
+        if self.jetstream:
+            await self._add_stream()
 
     async def stop(self) -> None:
         if self.nc is not None and not self.nc.is_closed:
@@ -43,22 +60,71 @@ class NatsBusDriver(BusDriver):
     async def _connect(self) -> None:
         if self.nc is None or self.nc.is_closed:
             self.nc = await nats.connect(servers=self.servers)
+            self.js = self.nc.jetstream() if self.jetstream else None
+
+    async def _add_stream(self) -> None:
+        try:
+            await self.js.add_stream(
+                name=self.STREAM_NAME,
+                subjects=[f"{self.STREAM_NAME}.>"],
+                retention=nats.js.api.RetentionPolicy.WORK_QUEUE,
+            )
+        except nats.js.errors.APIError as e:
+            log.warning("nats add stream `%s`: %s", self.STREAM_NAME, e)
+
+    async def backlog(self, streams: list[str]) -> dict[str, int]:
+        """
+        JetStream only: messages stored per subject, in one stream info call
+        (a work-queue stream keeps a message until it is acknowledged).
+        """
+        if not self.jetstream:
+            return {}
+        await self._connect()
+        info = await self.js.stream_info(self.STREAM_NAME, subjects_filter=f"{self.STREAM_NAME}.>")
+        subjects = info.state.subjects or {}
+        return {stream: subjects.get(self.subject(stream), 0) for stream in streams}
+
+    async def stats(self) -> dict:
+        stats = await super().stats()
+        if self.jetstream:
+            await self._connect()
+            state = (await self.js.stream_info(self.STREAM_NAME)).state
+            stats.update(messages=state.messages, bytes=state.bytes, consumers=state.consumer_count)
+            if self._subscribed_to:
+                info = await self._sub.consumer_info()
+                stats.update(num_pending=info.num_pending, num_ack_pending=info.num_ack_pending)
+        return stats
+
+    def subject(self, name: str | int | None) -> str:
+        if self.jetstream:
+            return f"{self.STREAM_NAME}.{self.MESSAGE_SUBJECT_PREFIX}{name!s}"
+        return f"{self.MESSAGE_SUBJECT_PREFIX}{name!s}"
 
     @async_try_ignore(fb=None)
     async def send(self, messages: list[BusMessage]) -> None:
+        # publish only buffers (jetstream captures the subjects without per-message acks),
+        # the whole batch is flushed to the server at once
         for message in messages:
             log.debug("sending message: %s", message)
-            subject = f"{self.MESSAGE_SUBJECT_PREFIX}{message.rcpt}"
             await self.nc.publish(
-                subject=subject,
-                payload=json.dumps(message.data).encode("utf-8"),
+                subject=self.subject(message.rcpt),
+                payload=self.encode_message(message),
             )
+        await self.nc.flush()
 
     @async_try_ignore(fb=None)
     async def _subscribe(self, name: str) -> None:
-        subject = f"{self.MESSAGE_SUBJECT_PREFIX}{name!s}"
+        subject = self.subject(name)
         if self._subscribed_to != subject:
-            self._sub = await self.nc.subscribe(subject)
+            if self.jetstream:
+                self._sub = await self.js.pull_subscribe(
+                    subject,
+                    durable=f"{self.DURABLE_PREFIX}{name!s}",
+                    stream=self.STREAM_NAME,
+                    config=nats.js.api.ConsumerConfig(ack_policy=nats.js.api.AckPolicy.EXPLICIT),
+                )
+            else:
+                self._sub = await self.nc.subscribe(subject)
             self._subscribed_to = subject
         return self._sub
 
@@ -68,10 +134,14 @@ class NatsBusDriver(BusDriver):
         name: str,
         count: int = 100,
         timeout: int = 0.025 * 1000,
+        ack: bool = True,
         *args: tuple,
         **kwargs: dict,
     ) -> list[BusMessage] | None:
 
+        if self.jetstream:
+            return await self._fetch(name, count, timeout, ack)
+
         messages = []
 
         sub = await self._subscribe(name)
@@ -81,8 +151,7 @@ class NatsBusDriver(BusDriver):
             try:
                 msg = await sub.next_msg(timeout=min(timeout / 1000, 1))
                 if msg:
-                    data = json.loads(msg.data.decode("utf-8"))
-                    bmsg = BusMessage(data=data, rcpt=name, msg_id=msg.sid)
+                    bmsg = BusMessage.from_raw(msg.data, self.decode, rcpt=name, msg_id=msg.sid)
                     messages.append(bmsg)
             except TimeoutError:
                 break
@@ -95,5 +164,34 @@ class NatsBusDriver(BusDriver):
 
         return messages
 
+    async def _fetch(self, name: str, count: int, timeout: float, ack: bool = True) -> list[BusMessage]:
+        sub = await self._subscribe(name)
+        try:
+            msgs = await sub.fetch(batch=count, timeout=timeout / 1000)
+        except nats.errors.TimeoutError:
+            return []
+
+        messages = []
+        for msg in msgs:
+            bmsg = BusMessage.from_raw(msg.data, self.decode, rcpt=name)
+            messages.append(bmsg)
+            if ack:
+                await msg.ack()  # buffered, like publish
+            else:
+                self._unacked[id(bmsg)] = msg
+        if ack:
+            await self.nc.flush()
+        return messages
+
+    async def ack(self, stream_name: str, messages: list[BusMessage]) -> None:
+        acked = False
+        for bmsg in messages:
+            msg = self._unacked.pop(id(bmsg), None)
+            if msg is not None:
+                await msg.ack()
+                acked = True
+        if acked:
+            await self.nc.flush()
+
 
 BusDriverFactory.register("nats", NatsBusDriver)
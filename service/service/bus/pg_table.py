@@ -1,5 +1,5 @@
 import asyncio
-import json
+import contextlib
 import time
 
 import asyncpg
@@ -13,12 +13,23 @@ class PostgresTablePollBusDriver(BusDriver):
     """
     Postgres bus driver:
     - table-based storage
-    - reads messages by polling the table
-    - marks messages as read immediately after reading
-    - uses JSONB for message data storage
+    - senders `pg_notify` the recipients, receivers `LISTEN` and wake up right away
+    - falls back to polling the table every `poll_interval`
+    - dequeues (marks messages as read) in a single UPDATE … RETURNING statement
+    - sends and receives over a connection pool, bulk sends go with binary COPY
+    - stores codec-encoded message data as BYTEA
+    - keeps the table small: a background task either deletes read rows in batches,
+      or (with `partition_size`) keeps id-range partitions ahead of the sequence
+      and drops the fully consumed ones; it also logs table size and dead rows
     - 🤯
     """
 
+    POOL_SIZE = 4
+    COPY_THRESHOLD = 64  # rows
+    RETENTION_INTERVAL = 10.0  # seconds
+    PARTITIONS_AHEAD = 4
+    TRIM_BATCH = 10000  # rows
+
     def __init__(
         self,
         table: str = "messages",
@@ -27,37 +38,105 @@ class PostgresTablePollBusDriver(BusDriver):
         user: str = "user",
         pswd: str = "password",
         db: str = "busride",
+        pool_size: int = POOL_SIZE,
+        copy_threshold: int = COPY_THRESHOLD,
+        retention_interval: float = RETENTION_INTERVAL,
+        partition_size: int = 0,
+        partitions_ahead: int = PARTITIONS_AHEAD,
+        trim_batch: int = TRIM_BATCH,
+        codec: str = "json",
+        compression: str | None = None,
+        compress_min_size: int = BusDriver.COMPRESS_MIN_SIZE,
         *args: tuple,
         **kwargs: dict,
     ) -> None:
+        self.setup_wire(codec, compression, compress_min_size)
         self.dsn = f"postgresql://{user}:{pswd}@{host}:{port}/{db}"
         self.table = table
-        self.conn: asyncpg.Connection | None = None
+        self.pool_size = max(1, int(pool_size))
+        self.copy_threshold = int(copy_threshold)
+        self.retention_interval = float(retention_interval)
+        self.partition_size = int(partition_size)
+        self.partitions_ahead = max(1, int(partitions_ahead))
+        self.trim_batch = int(trim_batch)
+        self.pool: asyncpg.Pool | None = None
+        self.listen_conn: asyncpg.Connection | None = None
+        self._wakeups: dict[str, asyncio.Event] = {}
+        self._retention_task: asyncio.Task | None = None
 
     async def start(self) -> None:
-        self.conn = await asyncpg.connect(self.dsn)
-        await self.conn.execute(
-            f"""
-            CREATE UNLOGGED TABLE IF NOT EXISTS {self.table} (
-            id SERIAL PRIMARY KEY,
-            rcpt VARCHAR(32),
-            sender VARCHAR(32),
-            data JSONB,
-            read BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP DEFAULT now()
-            );
-            CREATE INDEX IF NOT EXISTS idx_{self.table}_rcpt ON {self.table} (rcpt);
-            """
-        )
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=self.pool_size)
+        async with self.pool.acquire() as conn, conn.transaction():
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", self.table)
+            if self.partition_size > 0:
+                await conn.execute(f"""
+                    CREATE TABLE IF NOT EXISTS {self.table} (
+                    id BIGSERIAL,
+                    rcpt VARCHAR(32),
+                    sender VARCHAR(32),
+                    data BYTEA,
+                    read BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT now(),
+                    PRIMARY KEY (id)
+                    ) PARTITION BY RANGE (id);
+                    """)
+                await self._roll_partitions(conn)
+            else:
+                await conn.execute(f"""
+                    CREATE UNLOGGED TABLE IF NOT EXISTS {self.table} (
+                    id SERIAL PRIMARY KEY,
+                    rcpt VARCHAR(32),
+                    sender VARCHAR(32),
+                    data BYTEA,
+                    read BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT now()
+                    );
+                    """)
+            data_type = await conn.fetchval(
+                "SELECT format_type(atttypid, atttypmod) FROM pg_attribute WHERE attrelid = $1::regclass"
+                " AND attname = 'data' AND NOT attisdropped",
+                self.table,
+            )
+            if data_type != "bytea":
+                raise ValueError(
+                    f"pg_table `{self.table}`: the `data` column is {data_type}, not bytea "
+                    "(a table from an older version?): drop it or use another `table`"
+                )
+            await conn.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{self.table}_unread ON {self.table} (rcpt, id) WHERE read = FALSE;
+                DROP INDEX IF EXISTS idx_{self.table}_rcpt;
+                """)
+        if self.retention_interval > 0:
+            self._retention_task = asyncio.create_task(self._retention_loop())
 
     async def stop(self) -> None:
-        if self.conn:
-            await self.conn.close()
-            self.conn = None
+        if self._retention_task:
+            self._retention_task.cancel()
+            await asyncio.gather(self._retention_task, return_exceptions=True)
+            self._retention_task = None
+        if self.listen_conn:
+            await self.listen_conn.close()
+            self.listen_conn = None
+            self._wakeups = {}
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    def channel(self, stream_name: str) -> str:
+        return f"{self.table}.{stream_name}"
+
+    async def _listen(self, stream_name: str) -> asyncio.Event:
+        if stream_name not in self._wakeups:
+            if not self.listen_conn:
+                self.listen_conn = await asyncpg.connect(self.dsn)
+            wakeup = asyncio.Event()
+            await self.listen_conn.add_listener(self.channel(stream_name), lambda *_: wakeup.set())
+            self._wakeups[stream_name] = wakeup
+        return self._wakeups[stream_name]
 
     @async_try_ignore(fb=None)
     async def send(self, messages: list[BusMessage]) -> None:
-        if not self.conn:
+        if not self.pool:
             await self.start()
         insert_rows = []
         for message in messages:
@@ -66,18 +145,40 @@ class PostgresTablePollBusDriver(BusDriver):
                 (
                     str(message.rcpt) if message.rcpt else None,
                     str(message.sender) if message.sender else None,
-                    json.dumps(message.data),
+                    self.encode_message(message),
                 )
             )
 
-        await self.conn.executemany(
-            f"""
-            INSERT INTO {self.table}
-            (rcpt, sender, data)
-            VALUES ($1, $2, $3::jsonb)
-            """,
-            insert_rows,
-        )
+        async with self.pool.acquire() as conn:
+            try:
+                await self._insert(conn, insert_rows)
+            except asyncpg.CheckViolationError:  # ran past the last partition
+                async with conn.transaction():
+                    await conn.execute("SELECT pg_advisory_xact_lock(hashtext($1))", self.table)
+                    await self._roll_partitions(conn, reserve=len(insert_rows))
+                await self._insert(conn, insert_rows)
+            await conn.execute(
+                "SELECT pg_notify($1 || '.' || rcpt, '') FROM unnest($2::text[]) AS rcpt",
+                self.table,
+                list({row[0] for row in insert_rows if row[0]}),
+            )
+
+    async def _insert(self, conn: asyncpg.Connection, insert_rows: list[tuple]) -> None:
+        if len(insert_rows) >= self.copy_threshold:
+            await conn.copy_records_to_table(
+                self.table,
+                records=insert_rows,
+                columns=["rcpt", "sender", "data"],
+            )
+        else:
+            await conn.executemany(
+                f"""
+                INSERT INTO {self.table}
+                (rcpt, sender, data)
+                VALUES ($1, $2, $3)
+                """,
+                insert_rows,
+            )
 
     @async_try_ignore(fb=None)
     async def receive(
@@ -85,68 +186,187 @@ class PostgresTablePollBusDriver(BusDriver):
         stream_name: str,
         limit: int = 1024,
         timeout: float = 10.0,
-        poll_iterval: float = 1.0,
+        poll_interval: float = 1.0,
         *args: tuple,
         **kwargs: dict,
     ) -> list[BusMessage] | None:
-        if not self.conn:
+        if not self.pool:
             await self.start()
 
+        wakeup = await self._listen(stream_name)
         start_time = time.time()
-        ids, messages = [], []
 
         while True:
 
-            async with self.conn.transaction():
-                await self._fetch_unread_messages(stream_name, limit, ids, messages)
-                await self._mark_as_read(ids)
+            wakeup.clear()
+            messages = await self._dequeue(stream_name, limit)
 
             if len(messages) > 0:
                 log.debug("got %s messages from `%s`", len(messages), stream_name)
                 break
-            if time.time() - start_time > timeout:
+            remaining = timeout - (time.time() - start_time)
+            if remaining <= 0:
                 break
-            await asyncio.sleep(poll_iterval)
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(wakeup.wait(), min(poll_interval, remaining))
 
         return messages
 
-    async def _fetch_unread_messages(
-        self,
-        stream_name: str,
-        limit: int,
-        ids: list[int],
-        messages: list[BusMessage],
-    ) -> None:
-        rows = await self.conn.fetch(
+    async def _dequeue(self, stream_name: str, limit: int) -> list[BusMessage]:
+        rows = await self.pool.fetch(
             f"""
-                SELECT id, data, rcpt, sender
-                FROM {self.table}
-                WHERE rcpt = $1 AND read = FALSE
-                LIMIT $2
-                FOR UPDATE SKIP LOCKED
+                UPDATE {self.table}
+                SET read = TRUE
+                WHERE id = ANY(ARRAY(
+                    SELECT id
+                    FROM {self.table}
+                    WHERE rcpt = $1 AND read = FALSE
+                    ORDER BY id
+                    LIMIT $2
+                    FOR UPDATE SKIP LOCKED
+                ))
+                RETURNING id, data, rcpt, sender
             """,
             stream_name,
             limit,
         )
-        for row in rows:
-            ids.append(row["id"])
-            data = row["data"]
-            if isinstance(data, str | bytes):
-                data = json.loads(data)
-            msq = BusMessage(data=data, msg_id=data.get("id"), rcpt=row["rcpt"], sender=row["sender"])
+        messages = []
+        for row in sorted(rows, key=lambda row: row["id"]):
+            msq = BusMessage.from_raw(row["data"], self.decode, rcpt=row["rcpt"], sender=row["sender"])
             messages.append(msq)
+        return messages
 
-    async def _mark_as_read(self, ids: list[int]) -> None:
-        if not ids:
-            return
-        await self.conn.execute(
+    async def backlog(self, streams: list[str]) -> dict[str, int]:
+        """Unread rows per recipient, in one query over the partial index."""
+        if not self.pool:
+            await self.start()
+        rows = await self.pool.fetch(
             f"""
-                UPDATE {self.table}
-                SET read = TRUE
-                WHERE id = ANY($1::int[])
-             """,
-            ids,
+                SELECT rcpt, count(*) AS unread
+                FROM {self.table}
+                WHERE read = FALSE AND rcpt = ANY($1::text[])
+                GROUP BY rcpt
+            """,
+            list(streams),
+        )
+        unread = {row["rcpt"]: row["unread"] for row in rows}
+        return {stream: unread.get(stream, 0) for stream in streams}
+
+    async def stats(self) -> dict:
+        if not self.pool:
+            await self.start()
+        async with self.pool.acquire() as conn:
+            stats = {key: int(value) for key, value in (await self._table_stats(conn)).items()}
+            stats["unread"] = await conn.fetchval(f"SELECT count(*) FROM {self.table} WHERE read = FALSE")
+        return {**await super().stats(), **stats}
+
+    async def _retention_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.retention_interval)
+            try:
+                await self.retention()
+            except Exception as e:  # keep the task alive, whatever the round ran into
+                log.error("pg_table retention: %r", e)
+
+    async def retention(self) -> None:
+        """One maintenance round, done by one driver at a time."""
+        async with self.pool.acquire() as conn:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock(hashtext($1))", self.table):
+                return
+            try:
+                if self.partition_size > 0:
+                    await self._roll_partitions(conn)
+                else:
+                    await self._trim(conn)
+                stats = await self._table_stats(conn)
+                log.info(
+                    "pg_table `%s`: %s tables, %.1f MiB, live/dead rows %s/%s",
+                    self.table,
+                    stats["tables"],
+                    stats["bytes"] / 2**20,
+                    stats["live_rows"],
+                    stats["dead_rows"],
+                )
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock(hashtext($1))", self.table)
+
+    async def _trim(self, conn: asyncpg.Connection) -> None:
+        deleted = self.trim_batch
+        while deleted >= self.trim_batch:
+            result = await conn.execute(
+                f"""
+                    DELETE FROM {self.table}
+                    WHERE id = ANY(ARRAY(
+                        SELECT id
+                        FROM {self.table}
+                        WHERE read = TRUE
+                        LIMIT $1
+                        FOR UPDATE SKIP LOCKED
+                    ))
+                """,
+                self.trim_batch,
+            )
+            deleted = int(result.split()[-1])
+            log.debug("pg_table trimmed %s read rows", deleted)
+
+    async def _roll_partitions(self, conn: asyncpg.Connection, reserve: int = 0) -> None:
+        """
+        Creates `partitions_ahead` partitions past the current sequence value (+ `reserve` ids),
+        drops the ones behind it without unread rows.
+        """
+        last_id = await conn.fetchval(
+            "SELECT COALESCE(pg_sequence_last_value(pg_get_serial_sequence($1, 'id')::regclass), 0)",
+            self.table,
+        )
+        current = last_id // self.partition_size
+
+        existing = await conn.fetch(
+            """
+                SELECT c.relname
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = $1::regclass
+            """,
+            self.table,
+        )
+        existing = {int(row["relname"].rsplit("_p", 1)[-1]) for row in existing}
+
+        upto = (last_id + reserve) // self.partition_size + self.partitions_ahead
+        for n in range(current, upto + 1):
+            if n in existing:
+                continue
+            await conn.execute(f"""
+                    CREATE UNLOGGED TABLE IF NOT EXISTS {self.table}_p{n}
+                    PARTITION OF {self.table}
+                    FOR VALUES FROM ({n * self.partition_size}) TO ({(n + 1) * self.partition_size})
+                """)
+            log.debug("pg_table created partition %s_p%s", self.table, n)
+
+        for n in sorted(p for p in existing if p < current):
+            partition = f"{self.table}_p{n}"
+            if await conn.fetchval(f"SELECT EXISTS (SELECT 1 FROM {partition} WHERE read = FALSE)"):
+                continue
+            try:
+                async with conn.transaction():
+                    await conn.execute("SET LOCAL lock_timeout = '1s'")
+                    await conn.execute(f"DROP TABLE {partition}")
+                log.info("pg_table dropped consumed partition %s", partition)
+            except asyncpg.LockNotAvailableError:
+                log.debug("pg_table partition %s is busy, next time", partition)
+
+    async def _table_stats(self, conn: asyncpg.Connection) -> dict:
+        row = await conn.fetchrow(
+            """
+                SELECT
+                    count(*) AS tables,
+                    COALESCE(sum(pg_total_relation_size(relid)), 0) AS bytes,
+                    COALESCE(sum(n_live_tup), 0) AS live_rows,
+                    COALESCE(sum(n_dead_tup), 0) AS dead_rows
+                FROM pg_stat_user_tables
+                WHERE relname = $1 OR relname LIKE $1 || '\\_p%'
+            """,
+            self.table,
         )
+        return dict(row)
 
 
 BusDriverFactory.register("pg_table", PostgresTablePollBusDriver)
@@ -1,3 +1,7 @@
+import os
+import socket
+import time
+
 import redis.asyncio
 
 from ..helpers import async_try_ignore
@@ -9,31 +13,120 @@ class RedisBusDriver(BusDriver):
     """
     Redis bus driver.
 
-    This driver uses Redis to send and receive messages.
+    This driver uses Redis to send and receive messages,
+    message data goes encoded in a single stream entry field.
+    With `group` set, it reads through a consumer group (XREADGROUP),
+    so several replicas may share one stream; a batch is acknowledged
+    (and deleted) together with the next read — or, received with `ack=False`,
+    with the first read after `ack()` — entries stuck with dead consumers
+    are reclaimed with XAUTOCLAIM.
     """
 
     STREAM_MAXLEN = 10240
+    PIPELINE_SIZE = 1000
+    CLAIM_IDLE_MS = 30000
+    CLAIM_INTERVAL = 5.0
+    DATA_FIELD = b"d"
 
     def __init__(
         self,
         host: str = "localhost",
         port: int = 6379,
         db: int = 0,
+        pipeline_size: int = PIPELINE_SIZE,
+        transaction: bool = False,
+        group: str | None = None,
+        consumer: str | None = None,
+        claim_idle_ms: int = CLAIM_IDLE_MS,
+        claim_interval: float = CLAIM_INTERVAL,
+        codec: str = "json",
+        compression: str | None = None,
+        compress_min_size: int = BusDriver.COMPRESS_MIN_SIZE,
         *args: tuple,
         **kwargs: dict,
     ) -> None:
+        self.setup_wire(codec, compression, compress_min_size)
         self.redis = redis.asyncio.Redis(host=host, port=port, db=db)
+        self.pipeline_size = max(1, int(pipeline_size))
+        self.transaction = bool(transaction)
+        self.group = group
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.claim_idle_ms = int(claim_idle_ms)
+        self.claim_interval = float(claim_interval)
+        self._groups = set()
+        self._acks: dict[str, list] = {}
+        self._claim_cursors: dict[str, bytes | str] = {}
+        self._claimed_at: dict[str, float] = {}
 
-    @async_try_ignore(fb=None)
-    async def send(self, messages: list[BusMessage]) -> None:
+    async def stop(self) -> None:
+        if self.group:
+            for stream_name in list(self._acks):
+                await self._ack(stream_name)
+        await self.redis.aclose()
+
+    async def backlog(self, streams: list[str]) -> dict[str, int]:
+        """
+        Stream lengths in one pipeline: read entries are deleted,
+        so that is what waits (in group mode, with the delivered but not acknowledged ones).
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream_name in streams:
+                pipe.xlen(stream_name)
+            lengths = await pipe.execute()
+        return dict(zip(streams, lengths, strict=True))
+
+    async def stats(self) -> dict:
+        """Redis memory, plus the pending (unacknowledged) entries of the groups we read."""
+        streams = sorted(self._groups)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.info("memory")
+            for stream_name in streams:
+                pipe.xpending(stream_name, self.group)
+            info, *pending = await pipe.execute()
+        stats = {**await super().stats(), "used_memory": info.get("used_memory")}
+        if streams:
+            stats["pending"] = {
+                stream: summary["pending"] for stream, summary in zip(streams, pending, strict=True)
+            }
+        return stats
+
+    async def send(self, messages: list[BusMessage]) -> list[BusMessage]:
+        """
+        Sends messages grouped by recipient stream in pipelines
+        of up to `pipeline_size` commands, returns the messages that failed.
+        """
+        streams = {}
         for message in messages:
-            log.debug("sending message: %s", message)
-            await self.redis.xadd(
-                str(message.rcpt),
-                message.data,
-                maxlen=self.STREAM_MAXLEN,
-                approximate=True,
-            )
+            streams.setdefault(str(message.rcpt), []).append(message)
+        grouped = [message for stream_messages in streams.values() for message in stream_messages]
+
+        failed = []
+        for i in range(0, len(grouped), self.pipeline_size):
+            failed.extend(await self._send_pipeline(grouped[i : i + self.pipeline_size]))
+        return failed
+
+    async def _send_pipeline(self, messages: list[BusMessage]) -> list[BusMessage]:
+        try:
+            async with self.redis.pipeline(transaction=self.transaction) as pipe:
+                for message in messages:
+                    log.debug("sending message: %s", message)
+                    pipe.xadd(
+                        str(message.rcpt),
+                        {self.DATA_FIELD: self.encode_message(message)},
+                        maxlen=self.STREAM_MAXLEN,
+                        approximate=True,
+                    )
+                results = await pipe.execute(raise_on_error=False)
+        except redis.exceptions.RedisError as e:
+            log.error("redis send pipeline (%s messages): %s", len(messages), e)
+            return messages
+
+        failed = []
+        for message, result in zip(messages, results, strict=True):
+            if isinstance(result, Exception):
+                log.error("redis xadd to `%s`: %s", message.rcpt, result)
+                failed.append(message)
+        return failed
 
     @async_try_ignore(fb=None)
     async def receive(
@@ -41,30 +134,114 @@ class RedisBusDriver(BusDriver):
         stream_name: str,
         count: int = 100,
         block: int = 500,
+        ack: bool = True,
         *args: tuple,
         **kwargs: dict,
     ) -> list[BusMessage] | None:
 
-        data = await self.redis.xread(
-            {stream_name: 0},
-            count=count,
-            block=block,
-        )
+        if self.group:
+            data = await self._read_group(stream_name, count, block)
+        else:
+            data = await self.redis.xread(
+                {stream_name: 0},
+                count=count,
+                block=block,
+            )
 
         messages, ids_to_delete = [], []
 
         for stream_data in data or []:
             for msg in stream_data[1]:
                 msg_id, msg_data = msg
+                if msg_data is None:  # deleted while pending
+                    continue
                 log.debug("msg: %s %s", msg_id, msg_data)
-                bmsg = BusMessage(data=msg_data, msg_id=msg_id)
+                if self.DATA_FIELD in msg_data:
+                    bmsg = BusMessage.from_raw(msg_data[self.DATA_FIELD], self.decode, msg_id=msg_id)
+                else:  # plain field map
+                    bmsg = BusMessage(data=self.decode_fields(msg_data), msg_id=msg_id)
                 messages.append(bmsg)
                 ids_to_delete.append(msg_id)
 
-        if ids_to_delete:
+        if self.group:
+            if ack:
+                self._acks.setdefault(stream_name, []).extend(ids_to_delete)
+        elif ids_to_delete:
             await self.redis.xdel(stream_name, *ids_to_delete)
 
         return messages
 
+    async def ack(self, stream_name: str, messages: list[BusMessage]) -> None:
+        if self.group:
+            self._acks.setdefault(stream_name, []).extend(msg.msg_id for msg in messages)
+
+    @staticmethod
+    def decode_fields(fields: dict) -> dict:
+        return {
+            key.decode("utf-8") if isinstance(key, bytes) else key: (
+                value.decode("utf-8") if isinstance(value, bytes) else value
+            )
+            for key, value in fields.items()
+        }
+
+    async def _read_group(self, stream_name: str, count: int, block: int) -> list:
+        """
+        Acknowledges the previous batch and reads the next one in a single round trip,
+        entries idle for too long in other consumers' pending lists go first.
+        """
+        await self._ensure_group(stream_name)
+
+        claimed = await self._claim(stream_name, count)
+        if claimed:
+            return [[stream_name, claimed]]
+
+        acks = self._acks.pop(stream_name, [])
+        async with self.redis.pipeline(transaction=False) as pipe:
+            if acks:
+                pipe.xack(stream_name, self.group, *acks)
+                pipe.xdel(stream_name, *acks)
+            pipe.xreadgroup(self.group, self.consumer, {stream_name: ">"}, count=count, block=block)
+            results = await pipe.execute()
+        return results[-1]
+
+    async def _ensure_group(self, stream_name: str) -> None:
+        if stream_name in self._groups:
+            return
+        try:
+            await self.redis.xgroup_create(stream_name, self.group, id="0", mkstream=True)
+            log.info("created consumer group `%s` for `%s`", self.group, stream_name)
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._groups.add(stream_name)
+
+    async def _claim(self, stream_name: str, count: int) -> list:
+        now = time.time()
+        if now - self._claimed_at.get(stream_name, 0) < self.claim_interval:
+            return []
+        self._claimed_at[stream_name] = now
+        await self._ack(stream_name)  # not to reclaim our own last batch
+        cursor, claimed, *_ = await self.redis.xautoclaim(
+            stream_name,
+            self.group,
+            self.consumer,
+            min_idle_time=self.claim_idle_ms,
+            start_id=self._claim_cursors.get(stream_name, "0-0"),
+            count=count,
+        )
+        self._claim_cursors[stream_name] = cursor
+        if claimed:
+            log.info("reclaimed %s pending messages from `%s`", len(claimed), stream_name)
+        return claimed
+
+    async def _ack(self, stream_name: str) -> None:
+        acks = self._acks.pop(stream_name, [])
+        if not acks:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xack(stream_name, self.group, *acks)
+            pipe.xdel(stream_name, *acks)
+            await pipe.execute()
+
 
 BusDriverFactory.register("redis", RedisBusDriver)
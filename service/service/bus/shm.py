@@ -0,0 +1,292 @@
+import asyncio
+import contextlib
+import fcntl
+import os
+import struct
+import tempfile
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+from ..helpers import async_try_ignore
+from ..logger import log
+from .bus import BusDriver, BusDriverFactory, BusMessage
+
+
+class ShmRing:
+    """
+    Ring buffer in a named shared memory segment.
+
+    Layout: header (head, tail — monotonic byte counters; records written, read)
+    + data area with length-prefixed records; a record that does not fit before the end
+    of the data area is preceded by a skip marker and wraps to the start.
+    Many writers, one reader; writers are serialized with an exclusive `flock`.
+    The segment name carries the `LAYOUT` version, so a segment left by an older layout is never attached.
+    """
+
+    HEADER = struct.Struct("<QQQQ")
+    RECORD = struct.Struct("<I")
+    SKIP = 0xFFFFFFFF
+    LAYOUT = 2  # bump on any header or record change
+
+    def __init__(self, name: str, size: int) -> None:
+        self.name = f"{name}.v{self.LAYOUT}"
+        self.shm = self._open(self.name, size)
+        self.buf = self.shm.buf
+        self.capacity = self.shm.size - self.HEADER.size
+        self.read_tail = 0  # past the last record read, committed or not
+        self.lock_path = os.path.join(tempfile.gettempdir(), f"{self.name}.lock")
+        self.lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+
+    @staticmethod
+    def _open(name: str, size: int, retries: int = 100) -> shared_memory.SharedMemory:
+        for _ in range(retries):
+            try:
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                try:
+                    shm = shared_memory.SharedMemory(name=name)
+                except ValueError:  # created, but not sized yet
+                    time.sleep(0.01)
+                    continue
+            # the segment outlives any single process, keep the tracker away from it
+            resource_tracker.unregister(shm._name, "shared_memory")  # noqa
+            return shm
+        raise RuntimeError(f"shared memory segment `{name}` is not ready")
+
+    def close(self) -> None:
+        self.buf = None
+        try:
+            self.shm.close()
+        except BufferError:  # records still held by messages, the mapping goes with them
+            log.debug("shared memory segment `%s` still in use, left mapped", self.name)
+        os.close(self.lock_fd)
+
+    def unlink(self) -> None:
+        """Removes the segment and its lock file: processes still attached keep their mapping."""
+        # `unlink` unregisters it from the tracker
+        resource_tracker.register(self.shm._name, "shared_memory")  # noqa
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:  # unlinked already, by another driver
+            resource_tracker.unregister(self.shm._name, "shared_memory")  # noqa
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.lock_path)
+
+    def lock(self) -> None:
+        fcntl.flock(self.lock_fd, fcntl.LOCK_EX)
+
+    def unlock(self) -> None:
+        fcntl.flock(self.lock_fd, fcntl.LOCK_UN)
+
+    def write(self, records: list[bytes]) -> int:
+        """Writes as many records as fit, returns the count written."""
+        written = 0
+        self.lock()
+        try:
+            head, tail, records_written, _ = self.HEADER.unpack_from(self.buf, 0)
+            for record in records:
+                size = self.RECORD.size + len(record)
+                if size > self.capacity:
+                    raise ValueError(f"record of {size} bytes exceeds ring capacity {self.capacity}")
+                pos = head % self.capacity
+                pad = self.capacity - pos if self.capacity - pos < size else 0
+                if head + pad + size - tail > self.capacity:
+                    break
+                if pad >= self.RECORD.size:
+                    self.RECORD.pack_into(self.buf, self.HEADER.size + pos, self.SKIP)
+                head += pad
+                offset = self.HEADER.size + head % self.capacity
+                self.RECORD.pack_into(self.buf, offset, len(record))
+                self.buf[offset + self.RECORD.size : offset + size] = record
+                head += size
+                written += 1
+            struct.pack_into("<Q", self.buf, 0, head)
+            struct.pack_into("<Q", self.buf, 16, records_written + written)
+        finally:
+            self.unlock()
+        return written
+
+    def read(self, count: int) -> list[memoryview]:
+        """
+        Returns up to `count` records past the ones read already, as views into the segment:
+        they stay valid until `commit()` hands their space back to the writers.
+        """
+        head, tail = self.counters()[:2]
+        tail = max(tail, self.read_tail)
+
+        records = []
+        while tail < head and len(records) < count:
+            pos = tail % self.capacity
+            if self.capacity - pos < self.RECORD.size:
+                tail += self.capacity - pos
+                continue
+            offset = self.HEADER.size + pos
+            (length,) = self.RECORD.unpack_from(self.buf, offset)
+            if length == self.SKIP:
+                tail += self.capacity - pos
+                continue
+            start = offset + self.RECORD.size
+            records.append(self.buf[start : start + length])
+            tail += self.RECORD.size + length
+        self.read_tail = tail
+        return records
+
+    def commit(self, tail: int, records: int) -> None:
+        """Frees the ring up to `tail` (as `read()` left it), `records` more read."""
+        self.lock()
+        try:
+            records_read = self.HEADER.unpack_from(self.buf, 0)[3]
+            struct.pack_into("<Q", self.buf, 8, tail)
+            struct.pack_into("<Q", self.buf, 24, records_read + records)
+        finally:
+            self.unlock()
+
+    def counters(self) -> tuple[int, int, int, int]:
+        """Head, tail, records written and read."""
+        self.lock()
+        try:
+            return self.HEADER.unpack_from(self.buf, 0)
+        finally:
+            self.unlock()
+
+
+class SharedMemoryBusDriver(BusDriver):
+    """
+    Shared memory bus driver:
+    - one ring buffer (`multiprocessing.shared_memory`) per service id
+    - separate processes on the same host, no broker
+    - reads the whole available batch at once, one lock round per batch
+    - record: sender (length-prefixed) + wire payload, decoded lazily by the message
+    - zero-copy reads: messages hold views into the ring, so a batch is committed
+      (its space handed back to the writers) only on the next `receive()`;
+      read-ahead batches (`ack=False`) are copied out and committed right away instead,
+      as a ring pinned until their sends are done could deadlock stops sending to each other
+    - a full ring blocks the sender until the reader catches up
+    - rings outlive the processes: `unlink` removes the ones this driver opened on `stop()`
+      (unread records included), `remove()` the ones of the given streams — only once
+      no other process sends to or reads from them
+    """
+
+    RING_SIZE = 16 * 1024 * 1024
+    SENDER = struct.Struct("<H")
+
+    def __init__(
+        self,
+        prefix: str = "busride",
+        size: int = RING_SIZE,
+        poll_interval: float = 0.002,
+        unlink: bool = False,
+        codec: str = "json",
+        compression: str | None = None,
+        compress_min_size: int = BusDriver.COMPRESS_MIN_SIZE,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> None:
+        self.setup_wire(codec, compression, compress_min_size)
+        self.prefix = prefix
+        self.size = int(size)
+        self.poll_interval = float(poll_interval)
+        self.unlink = bool(unlink)
+        self.rings: dict[str, ShmRing] = {}
+        self._pending: dict[str, tuple[int, int]] = {}  # last batch per stream: ring tail past it, records
+
+    def ring(self, name: str | int | None) -> ShmRing:
+        name = str(name)
+        if name not in self.rings:
+            self.rings[name] = ShmRing(f"{self.prefix}.{name}", self.size)
+        return self.rings[name]
+
+    async def backlog(self, streams: list[str]) -> dict[str, int]:
+        backlog = {}
+        for stream in streams:
+            _, _, written, read = self.ring(stream).counters()
+            backlog[stream] = written - read
+        return backlog
+
+    async def stats(self) -> dict:
+        """Fill (bytes) of the rings this driver has opened."""
+        stats = await super().stats()
+        for name, ring in self.rings.items():
+            head, tail, _, _ = ring.counters()
+            stats[f"ring_{name}_bytes"] = head - tail
+        return stats
+
+    async def remove(self, streams: list[str]) -> None:
+        """Unlinks the rings of the streams and closes the driver."""
+        for stream in streams:
+            self.ring(stream).unlink()
+        await self.stop()
+
+    def _commit(self, stream_name: str) -> None:
+        """Hands the space of the stream's last batch back to the writers."""
+        pending = self._pending.pop(stream_name, None)
+        if pending:
+            self.ring(stream_name).commit(*pending)
+
+    async def stop(self) -> None:
+        for stream_name in list(self._pending):
+            self._commit(stream_name)
+        for ring in self.rings.values():
+            if self.unlink:
+                ring.unlink()
+            ring.close()
+        self.rings = {}
+
+    @async_try_ignore(fb=None)
+    async def send(self, messages: list[BusMessage]) -> None:
+        batches = {}
+        for message in messages:
+            log.debug("sending message: %s", message)
+            sender = str(message.sender or "").encode("utf-8")
+            record = self.SENDER.pack(len(sender)) + sender + self.encode_message(message)
+            batches.setdefault(str(message.rcpt), []).append(record)
+
+        for rcpt, records in batches.items():
+            ring = self.ring(rcpt)
+            while records:
+                written = ring.write(records)
+                records = records[written:]
+                if records:
+                    await asyncio.sleep(self.poll_interval)
+
+    @async_try_ignore(fb=None)
+    async def receive(
+        self,
+        stream_name: str,
+        count: int = 1024,
+        timeout: float = 0.5,
+        ack: bool = True,
+        *args: tuple,
+        **kwargs: dict,
+    ) -> list[BusMessage] | None:
+
+        ring = self.ring(stream_name)
+        self._commit(stream_name)  # the previous batch is handled by now
+        start = time.time()
+        messages = []
+
+        while True:
+            records = ring.read(count)
+            for record in records:
+                (sender_len,) = self.SENDER.unpack_from(record)
+                sender = str(record[self.SENDER.size : self.SENDER.size + sender_len], "utf-8") or None
+                raw = record[self.SENDER.size + sender_len :]
+                if not ack:
+                    raw = bytes(raw)
+                    record.release()
+                messages.append(BusMessage.from_raw(raw, self.decode, rcpt=stream_name, sender=sender))
+            if records:
+                if ack:
+                    self._pending[stream_name] = (ring.read_tail, len(records))
+                else:
+                    ring.commit(ring.read_tail, len(records))
+                log.debug("got %s messages from `%s`", len(messages), stream_name)
+                break
+            if time.time() - start > timeout:
+                break
+            await asyncio.sleep(self.poll_interval)
+
+        return messages
+
+
+BusDriverFactory.register("shm", SharedMemoryBusDriver)
@@ -0,0 +1,98 @@
+"""
+Compact route of a message, replacing the `;`-joined `log` of stop ids:
+- `rt`: one varint per stop, 5 bits per char (the 6th bit says more chars follow),
+  numeric stop ids as 2·id, any other id as 2·k+1 for the k-th name in `rn`
+- `rn`: `;`-joined stop names that are not plain numbers
+- `rd`: number of stops dropped from the front when the route keeps only a tail
+"""
+
+ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ-_"
+DIGITS = {ch: i for i, ch in enumerate(ALPHABET)}
+MORE = 32
+
+
+def encode_varint(value: int) -> str:
+    chars = []
+    while value >= MORE:
+        chars.append(ALPHABET[MORE | (value & (MORE - 1))])
+        value >>= 5
+    chars.append(ALPHABET[value])
+    return "".join(chars)
+
+
+def decode_varints(encoded: str) -> list[int]:
+    values, value, shift = [], 0, 0
+    for ch in encoded:
+        digit = DIGITS[ch]
+        value |= (digit & (MORE - 1)) << shift
+        if digit & MORE:
+            shift += 5
+            continue
+        values.append(value)
+        value, shift = 0, 0
+    return values
+
+
+def encode_signed(values: list[int]) -> str:
+    """Varints of zigzag-mapped values: small magnitudes of either sign stay short."""
+    return "".join(encode_varint(2 * value if value >= 0 else -2 * value - 1) for value in values)
+
+
+def decode_signed(encoded: str) -> list[int]:
+    return [value // 2 if value % 2 == 0 else -(value + 1) // 2 for value in decode_varints(encoded)]
+
+
+def _numeric(stop: str) -> bool:
+    return stop.isdigit() and str(int(stop)) == stop
+
+
+def encode(stops: list[str]) -> tuple[str, str]:
+    names, index, codes = [], {}, []
+    for stop in stops:
+        if _numeric(stop):
+            codes.append(encode_varint(2 * int(stop)))
+            continue
+        if stop not in index:
+            index[stop] = len(names)
+            names.append(stop)
+        codes.append(encode_varint(2 * index[stop] + 1))
+    return "".join(codes), ";".join(names)
+
+
+def decode(encoded: str, names: str = "") -> list[str]:
+    names = names.split(";") if names else []
+    return [str(code // 2) if code % 2 == 0 else names[code // 2] for code in decode_varints(encoded)]
+
+
+def stops(data: dict) -> list[str]:
+    """The stops kept in the message route (the legacy `log` too)."""
+    if data.get("rt") is None:
+        return data["log"].split(";") if data.get("log") else []
+    return decode(data["rt"], data.get("rn") or "")
+
+
+def dropped(data: dict) -> int:
+    return int(data.get("rd") or 0)
+
+
+def add_stop(data: dict, stop: str | int, tail: int = 0) -> None:
+    """Appends the stop to the route, keeping only the last `tail` stops if set."""
+    stop = str(stop)
+    if tail > 0:
+        route = [*stops(data), stop]
+        if len(route) > tail:
+            data["rd"] = dropped(data) + len(route) - tail
+            route = route[-tail:]
+        data["rt"], data["rn"] = encode(route)
+        return
+
+    rt, rn = data.get("rt") or "", data.get("rn") or ""
+    if _numeric(stop):
+        code = 2 * int(stop)
+    else:
+        names = rn.split(";") if rn else []
+        if stop not in names:
+            names.append(stop)
+            rn = ";".join(names)
+        code = 2 * names.index(stop) + 1
+    data["rt"], data["rn"] = rt + encode_varint(code), rn
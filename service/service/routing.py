@@ -0,0 +1,173 @@
+import abc
+import bisect
+import hashlib
+import json
+import random
+import time
+from argparse import Namespace
+from itertools import accumulate
+
+from .bus import BusDriver, BusMessage
+from .logger import log
+
+
+class Router(abc.ABC):
+    """
+    Picks the next stop of a message among the `services` of this service.
+    """
+
+    def __init__(self, service_id: str, services: list[str], config: Namespace) -> None:
+        self.service_id = str(service_id)
+        self.services = [str(srv) for srv in services]
+
+    @abc.abstractmethod
+    def choose(self, message: BusMessage | None) -> str | None:
+        pass
+
+    async def refresh(self, driver: BusDriver) -> None:
+        """Called before each batch is routed, for routers that watch the bus."""
+        return
+
+
+class RandomRouter(Router):
+
+    def choose(self, message: BusMessage | None) -> str | None:
+        if self.services:
+            return random.choice(self.services)
+        return None
+
+
+class WeightedRouter(Router):
+    """
+    Random choice by weights: `--routing-weights "1:3,2:1,X:0.5"`, unlisted stops weigh 1.
+    """
+
+    def __init__(self, service_id: str, services: list[str], config: Namespace) -> None:
+        super().__init__(service_id, services, config)
+        weights = parse_weights(config.routing_weights)
+        self.cum_weights = list(accumulate(weights.get(srv, 1.0) for srv in self.services))
+
+    def choose(self, message: BusMessage | None) -> str | None:
+        if self.services:
+            return random.choices(self.services, cum_weights=self.cum_weights)[0]
+        return None
+
+
+class HashRouter(Router):
+    """
+    Consistent hashing of the message id and hop counter on a ring with `VNODES` points per stop:
+    a message takes the same path on every ride, and a stop joining or leaving
+    only moves the messages of its share of the ring.
+    """
+
+    VNODES = 64
+
+    def __init__(self, service_id: str, services: list[str], config: Namespace) -> None:
+        super().__init__(service_id, services, config)
+        ring = sorted((self.hash(f"{srv}#{n}"), srv) for srv in self.services for n in range(self.VNODES))
+        self.points = [point for point, _ in ring]
+        self.owners = [srv for _, srv in ring]
+
+    @staticmethod
+    def hash(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def choose(self, message: BusMessage | None) -> str | None:
+        if not self.services:
+            return None
+        if message is None or message.msg_id is None:
+            return random.choice(self.services)
+        point = self.hash(f"{message.msg_id}:{message.data.get('counter', 0)}")
+        return self.owners[bisect.bisect(self.points, point) % len(self.points)]
+
+
+class PowerOfTwoRouter(Router):
+    """
+    Power of two choices: of two random stops, the one with the smaller backlog.
+    The backlog comes from `BusDriver.backlog()` every `REFRESH_INTERVAL`,
+    plus what was routed to each stop since; a failed (or empty) refresh keeps the previous one.
+    """
+
+    REFRESH_INTERVAL = 0.5  # seconds
+
+    def __init__(self, service_id: str, services: list[str], config: Namespace) -> None:
+        super().__init__(service_id, services, config)
+        self.backlog = dict.fromkeys(self.services, 0)
+        self.refreshed = 0.0
+
+    async def refresh(self, driver: BusDriver) -> None:
+        if time.monotonic() - self.refreshed < self.REFRESH_INTERVAL:
+            return
+        self.refreshed = time.monotonic()
+        try:
+            backlog = await driver.backlog(self.services)
+        except Exception as e:
+            log.error("p2c backlog refresh, keeping the previous one: %s", e)
+            return
+        if backlog:
+            self.backlog = {srv: int(backlog.get(srv, 0)) for srv in self.services}
+
+    def choose(self, message: BusMessage | None) -> str | None:
+        if len(self.services) < 2:
+            return self.services[0] if self.services else None
+        a, b = random.sample(self.services, 2)
+        rcpt = a if self.backlog[a] <= self.backlog[b] else b
+        self.backlog[rcpt] += 1
+        return rcpt
+
+
+class TopologyRouter(Router):
+    """
+    Static topology from a JSON file, the next stops of each stop, optionally weighted:
+    `{"0": ["1", "2"], "1": {"2": 3, "X": 1}, "2": ["X"]}`.
+    A stop missing from the file routes randomly among its `services`.
+    """
+
+    def __init__(self, service_id: str, services: list[str], config: Namespace) -> None:
+        super().__init__(service_id, services, config)
+        with open(config.routing_topology) as f:
+            topology = json.load(f)
+        next_stops = topology.get(self.service_id)
+        if next_stops is None:
+            log.warning("stop `%s` is not in the topology, routing randomly", self.service_id)
+            next_stops = self.services
+        if not isinstance(next_stops, dict):
+            next_stops = dict.fromkeys(next_stops, 1.0)
+        self.services = [str(srv) for srv in next_stops]
+        self.cum_weights = list(accumulate(float(weight) for weight in next_stops.values()))
+
+    def choose(self, message: BusMessage | None) -> str | None:
+        if self.services:
+            return random.choices(self.services, cum_weights=self.cum_weights)[0]
+        return None
+
+
+def parse_weights(weights: str | None) -> dict[str, float]:
+    parsed = {}
+    for item in (weights or "").replace(" ", ",").split(","):
+        if item:
+            srv, _, weight = item.rpartition(":")
+            parsed[srv] = float(weight)
+    return parsed
+
+
+class RouterFactory:
+
+    registry: dict[str, type[Router]] = {}
+
+    @classmethod
+    def register(cls, name: str, router_cls: type[Router]) -> None:
+        cls.registry[name] = router_cls
+
+    @classmethod
+    def create(cls, name: str, service_id: str, services: list[str], config: Namespace) -> Router:
+        if name not in cls.registry:
+            raise ValueError(f"Routing '{name}' not registered.")
+        return cls.registry[name](service_id, services, config)
+
+
+RouterFactory.register("random", RandomRouter)
+RouterFactory.register("weighted", WeightedRouter)
+RouterFactory.register("hash", HashRouter)
+RouterFactory.register("p2c", PowerOfTwoRouter)
+RouterFactory.register("topology", TopologyRouter)
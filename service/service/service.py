@@ -1,18 +1,39 @@
-import random
+import asyncio
+import math
 import time
 from argparse import Namespace
-from collections import Counter
-
-from .bus import BusDriver, BusMessage, dummy, get_bus_driver, kafka, nats, pg_table, redis  # noqa
+from collections import Counter, defaultdict
+
+from . import route
+from .bus import (  # noqa
+    BusDriver,
+    BusMessage,
+    dummy,
+    get_bus_driver,
+    kafka,
+    memory,
+    nats,
+    pg_table,
+    redis,
+    shm,
+)
 from .helpers import asleeq, rndstr
 from .logger import log
+from .routing import Router, RouterFactory
+from .stats import Histogram, IdBitmap, LegMatrix
+from .work import HardWork
 
 
 class Service:
 
+    STAGE_REPORT_INTERVAL = 10.0  # seconds
+
     def __init__(self, config: Namespace) -> None:
         self.config = config
+        self.stage_stats = Counter()
         self._driver = None
+        self._workload = None
+        self._router = None
         self.id = config.service_id
         self.services = config.services_list
 
@@ -21,105 +42,345 @@ class Service:
         if not self._driver:
             self._driver = get_bus_driver(
                 self.config.bus_type,
-                **self.config.bus_connection,
+                **{
+                    "codec": self.config.bus_codec,
+                    "compression": self.config.bus_compression,
+                    "compress_min_size": self.config.bus_compress_min_size,
+                    **self.config.bus_connection,
+                },
             )
         return self._driver
 
+    @property
+    def router(self) -> Router:
+        if not self._router:
+            self._router = RouterFactory.create(self.config.routing, self.id, self.services, self.config)
+        return self._router
+
+    @property
+    def workload(self) -> HardWork:
+        if not self._workload:
+            self._workload = HardWork(
+                self.config.work_profile,
+                self.config.work_executor,
+                self.config.work_pool_size,
+            )
+        return self._workload
+
+    async def hard_work(self, payload: str) -> None:
+        await self.workload(self.config.work_hard_time, payload)
+
     async def run(self) -> None:
         await self.driver.start()
+        if self.config.pipeline:
+            await self.pipeline()
         while True:
             await self.work()
         await self.driver.stop()  # noqa
 
+    async def pipeline(self) -> None:
+        """
+        Runs receive, process and send as separate stages, connected by queues
+        of up to `pipeline_depth` batches, so a slow stage holds back the ones before it.
+        A batch is acknowledged to the bus only once its output is sent, where the driver
+        can defer it: Redis groups, JetStream and Kafka without auto-commit.
+        """
+        depth = max(1, self.config.pipeline_depth)
+        inbox, outbox = asyncio.Queue(maxsize=depth), asyncio.Queue(maxsize=depth)
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(self.receive_stage(inbox))
+            tg.create_task(self.process_stage(inbox, outbox))
+            tg.create_task(self.send_stage(outbox))
+            tg.create_task(self.report_stages(inbox, outbox))
+
+    async def receive_stage(self, inbox: asyncio.Queue) -> None:
+        while True:
+            log.debug("reading for service_id=`%s` ...", self.id)
+            messages = await self.receive(ack=False)
+            if not messages:
+                continue
+            if inbox.full():
+                self.stage_stats["receive_blocked"] += 1
+            await inbox.put(messages)
+            self.stage_stats["received"] += len(messages)
+
+    async def process_stage(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        while True:
+            messages = await inbox.get()
+            output = await self.process(messages)
+            if outbox.full():
+                self.stage_stats["process_blocked"] += 1
+            await outbox.put((messages, output))
+            self.stage_stats["processed"] += len(messages)
+
+    async def send_stage(self, outbox: asyncio.Queue) -> None:
+        while True:
+            messages, output = await outbox.get()
+            if output:
+                await self.send(output)
+            await self.driver.ack(self.id, messages)
+
+    async def report_stages(self, inbox: asyncio.Queue, outbox: asyncio.Queue) -> None:
+        while True:
+            await asyncio.sleep(self.STAGE_REPORT_INTERVAL)
+            log.info(
+                "pipeline: inbox %s/%s, outbox %s/%s batches; "
+                "received/processed/sent %s/%s/%s messages; blocked receive/process %s/%s times",
+                inbox.qsize(),
+                inbox.maxsize,
+                outbox.qsize(),
+                outbox.maxsize,
+                self.stage_stats["received"],
+                self.stage_stats["processed"],
+                self.stage_stats["sent"],
+                self.stage_stats["receive_blocked"],
+                self.stage_stats["process_blocked"],
+            )
+
     async def work(self) -> None:
         # read
         log.debug("reading for service_id=`%s` ...", self.id)
-        inbox = await self.driver.receive(self.id)
+        inbox = await self.receive()
         if not inbox:
             return
+        self.stage_stats["received"] += len(inbox)
 
         # process
         output = await self.process(inbox)
+        self.stage_stats["processed"] += len(inbox)
 
         # write
-        await self.driver.send(output)
+        await self.send(output)
 
-    async def process(self, messages: list[BusMessage]) -> list[BusMessage]:
-        output = []
+    async def receive(self, ack: bool = True) -> list[BusMessage] | None:
+        messages = await self.driver.receive(self.id, ack=ack)
+        received_ns = time.time_ns()
         for msg in messages or []:
-            datas = msg.datas()
-            log.debug("processing: id=%s log=%.80s", datas["id"], datas["log"])
-
-            # hard work simulation
-            await asleeq(self.config.work_hard_time)
-            datas["log"] = str(datas.get("log") or "") + ";" + str(self.id)
-            datas["counter"] = int(datas.get("counter", 0)) + 1
-            datas["payload"] = rndstr(256)
-
-            out_msg = BusMessage(
-                data=datas,
-                rcpt=self.choose_rcpt(msg),
-                sender=self.id,
-            )
+            msg.received_ns = received_ns
+        return messages
 
-            log.debug("next hop: #%s [%s]->[%s]", datas["id"], self.id, out_msg.rcpt)
-            if out_msg.rcpt is not None:
-                output.append(out_msg)
+    async def send(self, messages: list[BusMessage]) -> None:
+        self.stamp(messages)
+        failed = await self.driver.send(messages)
+        self.stage_stats["sent"] += len(messages) - len(failed or [])
+        self.stage_stats["send_failed"] += len(failed or [])
+        if failed:
+            log.warning("failed to send %s of %s messages", len(failed), len(messages))
+
+    async def process(self, messages: list[BusMessage]) -> list[BusMessage]:
+        """
+        Processes the batch, up to `max_inflight` messages at a time,
+        returning the outputs in the inbox order or as they complete (`inflight_order`).
+        """
+        messages = messages or []
+        await self.router.refresh(self.driver)
+        max_inflight = self.config.max_inflight
+        if max_inflight <= 1 or len(messages) <= 1:
+            results = [await self.process_one(msg) for msg in messages]
+            return [out_msg for out_msg in results if out_msg is not None]
+
+        semaphore = asyncio.Semaphore(max_inflight)
+
+        async def bounded(msg: BusMessage) -> BusMessage | None:
+            async with semaphore:
+                return await self.process_one(msg)
+
+        tasks = [asyncio.ensure_future(bounded(msg)) for msg in messages]
+        if self.config.inflight_order == "completed":
+            results = [await task for task in asyncio.as_completed(tasks)]
+        else:
+            results = await asyncio.gather(*tasks)
+        return [out_msg for out_msg in results if out_msg is not None]
+
+    async def process_one(self, msg: BusMessage) -> BusMessage | None:
+        datas = msg.datas()
+        log.debug("processing: id=%s route=%.80s", datas["id"], datas["rt"])
+
+        # hard work simulation
+        await self.hard_work(str(datas.get("payload") or ""))
+        route.add_stop(datas, self.id, self.config.route_tail)
+        datas["counter"] = int(datas.get("counter", 0)) + 1
+        datas["payload"] = rndstr(256)
+
+        out_msg = BusMessage(
+            data=datas,
+            rcpt=self.choose_rcpt(msg),
+            sender=self.id,
+            msg_id=datas["id"],
+        )
+        out_msg.received_ns = msg.received_ns
+
+        log.debug("next hop: #%s [%s]->[%s]", datas["id"], self.id, out_msg.rcpt)
+        if out_msg.rcpt is None:
+            return None
+        return out_msg
+
+    def stamp(self, messages: list[BusMessage]) -> None:
+        """
+        Stamps the enqueue time (`te`, ns) and appends this stop's wait and work (µs, varints)
+        to `lat`: the time on the bus since the previous stop's `te`, and from taking the message
+        off the bus to sending it on. `lat` keeps the last `latency_tail` stops (none if 0),
+        its entries line up with the last route stops.
+        """
+        tail = self.config.latency_tail
+        if tail <= 0:
+            return
+        enqueued_ns = time.time_ns()
+        for msg in messages:
+            if msg.received_ns is None:
+                continue
+            datas = msg.data
+            wait = (msg.received_ns - int(datas["te"])) // 1000 if datas.get("te") else 0
+            lat = (datas.get("lat") or "") + route.encode_signed(
+                [wait, (enqueued_ns - msg.received_ns) // 1000]
+            )
+            if len(lat) > 4 * tail:  # maybe over the tail, at least 2 chars per stop
+                values = route.decode_signed(lat)
+                if len(values) > 2 * tail:
+                    lat = route.encode_signed(values[-2 * tail :])
+            datas["lat"] = lat
+            datas["te"] = enqueued_ns
 
-        return output
+    def stats(self) -> dict:
+        """Message counters, summed up across processes by the supervisor."""
+        return {**self.stage_stats, **(self.driver.traffic or {})}
 
     def choose_rcpt(self, message: BusMessage | None) -> str | None:
-        if self.services:
-            return random.choice(self.services)
-        return None
+        return self.router.choose(message)
 
     async def idle(self, ts: float = 1.0) -> None:
         await asleeq(ts)
 
+    def show_traffic(self) -> None:
+        traffic = self.driver.traffic
+        if not traffic:
+            return
+        for way in ("sent", "received"):
+            if not traffic[f"{way}_messages"]:
+                continue
+            log.info(
+                "  %s: %s messages, raw/wire bytes %s/%s (×%.2f)",
+                way,
+                traffic[f"{way}_messages"],
+                traffic[f"{way}_raw_bytes"],
+                traffic[f"{way}_wire_bytes"],
+                traffic[f"{way}_raw_bytes"] / max(traffic[f"{way}_wire_bytes"], 1),
+            )
+
 
 class ServiceKicker(Service):
+    """
+    Open-loop load generator: sends messages on a fixed schedule of `kick_rate` msgs/s
+    (as fast as possible if 0), ramping up linearly over `kick_ramp_up` seconds,
+    until `kick_count` messages are sent or `kick_duration` seconds are over;
+    each wake-up sends the messages that are due, at most `kick_chunk` of them.
+    """
 
     def __init__(self, config: Namespace) -> None:
         super().__init__(config)
         self.kick_count = config.kick_count
+        self.kick_rate = float(config.kick_rate)
+        self.kick_chunk = max(1, int(config.kick_chunk))
+        self.kick_ramp_up = max(0.0, float(config.kick_ramp_up))
+        self.kick_duration = float(config.kick_duration)
         self.work_hard_time = config.work_hard_time
+        self.kicked = 0
 
     async def run(self) -> None:
         await self.driver.start()
         await self.kick()
         log.info("kicker is done")
+        self.show_traffic()
         while self.config.exit is False:
             await self.idle(999)
         log.info("kicker exiting")
+        self.workload.close()
         await self.driver.stop()
 
     async def kick(self) -> None:
-        messages = []
-        for i in range(1, int(self.kick_count) + 1):
-            await asleeq(self.work_hard_time)
-            message = BusMessage(
-                data={
-                    "id": str(i),
-                    "ts": int(time.time()),
-                    "counter": 1,
-                    "log": str(self.id),
-                    "payload": rndstr(256),
-                },
-                rcpt=self.choose_rcpt(None),
-                sender=self.id,
-            )
-            log.info("kicking the bus: #%s ·→[%s]", i, message.rcpt)
-            messages.append(message)
-        await self.driver.send(messages)
+        started = reported = time.monotonic()
+        i = 0
+        while not self.kick_done(i, started):
+            delay = started + self.kick_schedule(i) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            await self.router.refresh(self.driver)
+            messages = []
+            while (
+                len(messages) < self.kick_chunk
+                and not self.kick_done(i, started)
+                and started + self.kick_schedule(i) <= time.monotonic()
+            ):
+                i += 1
+                messages.append(await self.kick_message(i))
+            if not messages:  # woke up early
+                continue
+            await self.send(messages)
+            self.kicked += len(messages)
+
+            if time.monotonic() - reported >= self.STAGE_REPORT_INTERVAL:
+                reported = time.monotonic()
+                log.info("kicking: %s messages, %.1f msgs/s", self.kicked, self.kicked / (reported - started))
+
+        elapsed = time.monotonic() - started
+        log.info(
+            "kicked %s messages in %.3fs: %.1f msgs/s (target %s)",
+            self.kicked,
+            elapsed,
+            self.kicked / elapsed if elapsed else 0,
+            f"{self.kick_rate:g} msgs/s, ramp-up {self.kick_ramp_up:g}s" if self.kick_rate > 0 else "none",
+        )
+
+    def kick_schedule(self, n: int) -> float:
+        """Seconds from the start to the n-th (0-based) message: ~n²/2 under the ramp-up, linear past it."""
+        if self.kick_rate <= 0:
+            return 0.0
+        ramp_count = self.kick_rate * self.kick_ramp_up / 2
+        if n < ramp_count:
+            return math.sqrt(2 * self.kick_ramp_up * n / self.kick_rate)
+        return self.kick_ramp_up + (n - ramp_count) / self.kick_rate
+
+    def kick_done(self, n: int, started: float) -> bool:
+        if self.kick_count and n >= self.kick_count:
+            return True
+        if self.kick_duration > 0:
+            if self.kick_rate > 0:
+                return self.kick_schedule(n) >= self.kick_duration
+            return time.monotonic() - started >= self.kick_duration
+        return not self.kick_count
+
+    async def kick_message(self, i: int) -> BusMessage:
+        started_ns = time.time_ns()
+        payload = rndstr(256)
+        await self.hard_work(payload)
+        message = BusMessage(
+            data={
+                "id": str(i),
+                "ts": started_ns,
+                "counter": 1,
+                "payload": payload,
+            },
+            sender=self.id,
+            msg_id=str(i),
+        )
+        route.add_stop(message.data, self.id)
+        message.rcpt = self.choose_rcpt(message)
+        message.received_ns = started_ns  # the kicker's work counts as its stop
+        log.debug("kicking the bus: #%s ·→[%s]", i, message.rcpt)
+        return message
 
 
 class ServiceCatcher(Service):
 
     def __init__(self, config: Namespace) -> None:
-        self.caught_ids = set()
-        self.caught_stops = Counter()
-        self.caught_legs = Counter()
-        self.travel_times = []
+        self.caught_ids = IdBitmap()
+        self.caught_matrix = LegMatrix()
+        self.travel_times = Histogram()
+        self.travel_legs = Histogram()
+        self.stop_waits = defaultdict(lambda: Histogram(min_value=1))
+        self.stop_works = defaultdict(lambda: Histogram(min_value=1))
+        self.leg_waits = defaultdict(lambda: Histogram(min_value=1))
         self.catch_count = config.catch_count
         super().__init__(config)
 
@@ -140,97 +401,143 @@ class ServiceCatcher(Service):
         await self.driver.stop()
         log.info("catcher exiting")
 
+    @property
+    def caught_stops(self) -> Counter:
+        return self.caught_matrix.stop_counts()
+
+    @property
+    def caught_legs(self) -> Counter:
+        return self.caught_matrix.leg_counts()
+
     async def process(self, messages: list[BusMessage]) -> list[BusMessage]:
+        routes = []
         for message in messages:
             message_data = message.datas()
-            self.process_message(message_data)
+            routes.append(self.process_message(message_data, message.received_ns))
+        self.caught_matrix.add(routes)
         return []
 
-    def process_message(self, msg: dict) -> None:
+    def process_message(self, msg: dict, received_ns: int | None = None) -> list[str]:
 
         # keep message ids
-        if msg["id"] in self.caught_ids:
+        if not self.caught_ids.add(msg["id"]):
             log.warning("already catched: #%s", msg["id"])
-        self.caught_ids.add(msg["id"])
 
-        # count all ride stops and legs
-        logs = msg.get("log", "").split(";")
+        # the ride stops (the route tail, if capped), counted per batch
+        logs = route.stops(msg)
         logs.append("X")  # we are right here, at the end
-        self.caught_stops.update(logs)
-        for i in range(len(logs) - 1):
-            leg = (logs[i], logs[i + 1])
-            self.caught_legs.update([leg])
+        stops_count = route.dropped(msg) + len(logs)
 
-        # save travel time
-        travel_time = int(time.time()) - int(msg.get("ts", 0))
-        self.travel_times.append((travel_time, len(logs)))
+        # save travel time, seconds
+        received_ns = received_ns or time.time_ns()
+        travel_time = (received_ns - int(msg.get("ts") or received_ns)) / 1e9
+        self.travel_times.add(travel_time)
+        self.travel_legs.add(stops_count)
+        self.add_latencies(logs, msg, received_ns)
 
         # log the message
         log.info(
-            "catched (%s): #%s payload=%.10s tt=%s log=|%s/%s|=%.80s",
+            "catched (%s): #%s payload=%.10s tt=%.6fs log=|%s/%s|=%.80s",
             len(self.caught_ids),
             msg["id"],
             msg["payload"],
-            f"{travel_time // 60}:{travel_time % 60:02d}",
-            len(logs),
+            travel_time,
+            stops_count,
             len(set(logs)),
-            msg["log"],
+            ";".join(logs[:-1]),
+        )
+        return logs
+
+    def add_latencies(self, logs: list[str], msg: dict, received_ns: int) -> None:
+        """
+        Per stop wait/work and per leg wait times (ns), from the `lat` stamps of the hops,
+        lined up with the last stops of the route.
+        """
+        if not msg.get("lat") or not msg.get("te"):
+            return
+        values = [us * 1000 for us in route.decode_signed(msg["lat"])]
+        hops = list(zip(values[::2], values[1::2], strict=True))
+        count = min(len(hops), len(logs) - 1)
+        stops, hops = logs[-count - 1 :], hops[len(hops) - count :]
+        hops.append((received_ns - int(msg["te"]), 0))  # the bus leg to us
+        for i, stop in enumerate(stops[:-1]):
+            self.stop_works[stop].add(hops[i][1])
+            leg, wait = (stop, stops[i + 1]), hops[i + 1][0]
+            self.leg_waits[leg].add(wait)
+            self.stop_waits[leg[1]].add(wait)
+
+    def show_latencies(self) -> None:
+        def ms(histogram: Histogram) -> str:
+            return "/".join(f"{histogram.quantile(q) / 1e6:.3f}" for q in (0.5, 0.99, 0.999))
+
+        log.info("  stop latencies, wait on the bus | work, p50/p99/p99.9 ms:")
+        for stop in sorted(set(self.stop_waits) | set(self.stop_works)):
+            log.info(
+                "    %s: %s | %s",
+                stop,
+                ms(self.stop_waits[stop]) if stop in self.stop_waits else "-",
+                ms(self.stop_works[stop]) if stop in self.stop_works else "-",
+            )
+        slowest = sorted(self.leg_waits.items(), key=lambda item: -item[1].quantile(0.99))[:10]
+        log.info(
+            "  slowest legs, wait p50/p99/p99.9 ms: %s",
+            "; ".join(f"{leg[0]}→{leg[1]} {ms(histogram)}" for leg, histogram in slowest),
         )
 
     def show_stats(self) -> None:
+        caught_stops, caught_legs = self.caught_stops, self.caught_legs
         log.info("catcher stats:")
         log.info("  caught messages: %s", len(self.caught_ids))
         log.info(
             "  stops unique/total: %s/%s",
-            len(self.caught_stops),
-            sum(self.caught_stops.values()),
+            len(caught_stops),
+            sum(caught_stops.values()),
         )
         log.info(
             "  legs unique/total: %s/%s",
-            len(self.caught_legs),
-            sum(self.caught_legs.values()),
-        )
-        log.info(
-            "  min travel time/legs: %.0d/%.0d",
-            min([tt[0] for tt in self.travel_times]),
-            min([tt[1] for tt in self.travel_times]),
-        )
-        log.info(
-            "  max travel time/legs: %.0d/%.0d",
-            max([tt[0] for tt in self.travel_times]),
-            max([tt[1] for tt in self.travel_times]),
-        )
-        log.info(
-            "  avg travel time/legs: %.2f/%.2f",
-            sum([tt[0] for tt in self.travel_times]) / len(self.travel_times),
-            sum([tt[1] for tt in self.travel_times]) / len(self.travel_times),
+            len(caught_legs),
+            sum(caught_legs.values()),
         )
+        if self.travel_times.count:  # min/max are ±inf until then
+            log.info("  min travel time/legs: %.6f/%.0d", self.travel_times.min, self.travel_legs.min)
+            log.info("  max travel time/legs: %.6f/%.0d", self.travel_times.max, self.travel_legs.max)
+            log.info("  avg travel time/legs: %.6f/%.2f", self.travel_times.mean, self.travel_legs.mean)
+            for q, travel_time in self.travel_times.quantiles().items():
+                log.info(
+                    "  p%s travel time/legs: %.6f/%.0f",
+                    f"{q * 100:g}",
+                    travel_time,
+                    self.travel_legs.quantile(q),
+                )
         log.info(
             "  most common stops: %s",
-            "; ".join([f"{k}×{v}" for k, v in self.caught_stops.most_common(10)]),
+            "; ".join([f"{k}×{v}" for k, v in caught_stops.most_common(10)]),
         )
         log.info(
             "  most common legs: %s",
-            "; ".join([f"{k[0]}→{k[1]}×{v}" for k, v in self.caught_legs.most_common(10)]),
+            "; ".join([f"{k[0]}→{k[1]}×{v}" for k, v in caught_legs.most_common(10)]),
         )
+        self.show_latencies()
+        self.show_traffic()
 
     def draw_stats(self) -> None:
+        caught_stops, caught_legs = self.caught_stops, self.caught_legs
         plantuml = [""]
         plantuml.append("@startuml")
         plantuml.append("scale 4096 width")
         plantuml.append(
             f"""title Fun Ride: {self.config.bus_type} bus, """
             f"""{len(self.caught_ids)} passengers, """
-            f"""{len(self.caught_stops)} stops"""
+            f"""{len(caught_stops)} stops"""
         )
         stop_styles = {"0": "<<choice>>", "X": "<<end>>", None: "<<choice>>"}
-        for stop in self.caught_stops:
+        for stop in caught_stops:
             style = stop_styles.get(stop, "")
-            cnt = self.caught_stops[stop]
+            cnt = caught_stops[stop]
             plantuml.append(f"""state "s{stop}" as s{stop} {style}: ×{cnt}""")
         leg_styles = {"0": "down", "X": "down", None: ""}
-        for leg in self.caught_legs:
-            cnt = self.caught_legs[leg]
+        for leg in caught_legs:
+            cnt = caught_legs[leg]
             style = leg_styles.get(leg[0], "")
             plantuml.append(f"s{leg[0]} -{style}-> s{leg[1]}: ×{cnt}")
         plantuml.append("@enduml")
@@ -241,10 +548,75 @@ class ServiceCatcher(Service):
         log.info("########## ✂")
 
 
+class ServiceRide(Service):
+    """
+    The whole ride in one event loop: a kicker, N workers and a catcher.
+    Nothing outlives the ride: shm rings are unlinked once all the stops are done.
+    """
+
+    KICKER_ID = "0"
+    CATCHER_ID = "X"
+
+    def __init__(self, config: Namespace) -> None:
+        super().__init__(config)
+        workers = [str(i) for i in range(1, int(config.workers_count) + 1)]
+        self.catcher = ServiceCatcher(
+            self.derive_config(
+                service_id=self.CATCHER_ID,
+                services_list=[],
+                catch_count=config.catch_count or config.kick_count or None,
+                exit=True,
+            )
+        )
+        self.workers = [
+            Service(self.derive_config(service_id=sid, services_list=[*workers, self.CATCHER_ID]))
+            for sid in workers
+        ]
+        self.kicker = ServiceKicker(
+            self.derive_config(service_id=self.KICKER_ID, services_list=workers, exit=True)
+        )
+
+    def derive_config(self, **kwargs: dict) -> Namespace:
+        return Namespace(**{**vars(self.config), **kwargs})
+
+    def kicker_done(self, task: asyncio.Task) -> None:
+        if self.catcher.catch_count is None and not task.cancelled():
+            # duration-based kick: now we know how many to catch
+            self.catcher.catch_count = self.kicker.kicked
+
+    async def run(self) -> None:
+        started = time.time()
+        catcher = asyncio.create_task(self.catcher.run())
+        others = [asyncio.create_task(srv.run()) for srv in [*self.workers, self.kicker]]
+        others[-1].add_done_callback(self.kicker_done)
+        try:
+            await catcher
+        finally:
+            for task in others:
+                task.cancel()
+            await asyncio.gather(*others, return_exceptions=True)
+            await asyncio.gather(*(srv.driver.stop() for srv in self.workers), return_exceptions=True)
+            if self.config.bus_type == "shm":  # every stop is done with the rings now
+                await self.driver.remove([self.kicker.id, *(srv.id for srv in self.workers), self.catcher.id])
+
+        elapsed = time.time() - started
+        messages = len(self.catcher.caught_ids)
+        hops = self.catcher.travel_legs.total - self.catcher.travel_legs.count
+        log.info(
+            "ride finished: %s messages, %s hops in %.3fs (%.1f µs/hop)",
+            messages,
+            hops,
+            elapsed,
+            elapsed / hops * 1e6 if hops else 0,
+        )
+
+
 class ServiceFactory:
 
     @classmethod
     def create(cls, config: Namespace) -> Service:
+        if config.service_type == "ride":
+            return ServiceRide(config)
         if config.service_type == "kicker":
             return ServiceKicker(config)
         if config.service_type == "catcher":
@@ -0,0 +1,205 @@
+import math
+from array import array
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:  # optional, falls back to `array`
+    numpy = None
+
+
+class IdBitmap:
+    """
+    Set of message ids, one bit per id for the dense integer ids the kicker hands out
+    (any other id falls back to a plain set).
+    """
+
+    def __init__(self) -> None:
+        self.bits = bytearray()
+        self.others = set()
+        self.count = 0
+
+    @staticmethod
+    def _int(msg_id: str | int) -> int | None:
+        if isinstance(msg_id, int):
+            return msg_id if msg_id >= 0 else None
+        if msg_id.isascii() and msg_id.isdecimal() and str(int(msg_id)) == msg_id:  # not "²", nor "007"
+            return int(msg_id)
+        return None
+
+    def add(self, msg_id: str | int) -> bool:
+        """Adds the id, returns False if it was there already."""
+        n = self._int(msg_id)
+        if n is None:
+            if msg_id in self.others:
+                return False
+            self.others.add(msg_id)
+            self.count += 1
+            return True
+        byte, bit = divmod(n, 8)
+        if byte >= len(self.bits):
+            self.bits.extend(bytes(max(byte + 1 - len(self.bits), len(self.bits))))
+        if self.bits[byte] & (1 << bit):
+            return False
+        self.bits[byte] |= 1 << bit
+        self.count += 1
+        return True
+
+    def __contains__(self, msg_id: str | int) -> bool:
+        n = self._int(msg_id)
+        if n is None:
+            return msg_id in self.others
+        byte, bit = divmod(n, 8)
+        return byte < len(self.bits) and bool(self.bits[byte] & (1 << bit))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class RunningStats:
+    """Count, sum, min, max, mean and standard deviation in one pass (Welford)."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self._m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class Histogram(RunningStats):
+    """
+    Log-bucketed histogram: constant memory, quantiles within `precision` relative error.
+    Values below `min_value` (zeros included) share the first bucket.
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99, 0.999)
+
+    def __init__(self, precision: float = 0.01, min_value: float = 1e-9) -> None:
+        super().__init__()
+        self.min_value = min_value
+        self._log_base = math.log1p(2 * precision)
+        self.buckets: dict[int, int] = {}
+
+    def add(self, value: float) -> None:
+        super().add(value)
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def _index(self, value: float) -> int:
+        if value < self.min_value:
+            return -1
+        return int(math.log(value / self.min_value) / self._log_base)
+
+    def _value(self, index: int) -> float:
+        if index < 0:
+            return 0.0
+        return self.min_value * math.exp((index + 0.5) * self._log_base)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank, seen = q * (self.count - 1), 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def quantiles(self) -> dict[float, float]:
+        return {q: self.quantile(q) for q in self.QUANTILES}
+
+
+class LegMatrix:
+    """
+    Stop and leg counters: stop names are interned to small ints,
+    legs are counted per batch into a dense adjacency matrix
+    (NumPy, or a flat `array` without it).
+    """
+
+    def __init__(self, capacity: int = 16, use_numpy: bool = True) -> None:
+        self.names: list[str] = []
+        self.index: dict[str, int] = {}
+        self.capacity = capacity
+        self.numpy = use_numpy and numpy is not None
+        if self.numpy:
+            self.stops = numpy.zeros(capacity, dtype=numpy.int64)
+            self.legs = numpy.zeros((capacity, capacity), dtype=numpy.int64)
+        else:
+            self.stops = array("q", bytes(8 * capacity))
+            self.legs = array("q", bytes(8 * capacity * capacity))
+
+    def intern(self, name: str) -> int:
+        n = self.index.get(name)
+        if n is None:
+            n = self.index[name] = len(self.names)
+            self.names.append(name)
+        return n
+
+    def _grow(self, size: int) -> None:
+        capacity = self.capacity
+        while capacity < size:
+            capacity *= 2
+        if self.numpy:
+            stops = numpy.zeros(capacity, dtype=numpy.int64)
+            stops[: self.capacity] = self.stops
+            legs = numpy.zeros((capacity, capacity), dtype=numpy.int64)
+            legs[: self.capacity, : self.capacity] = self.legs
+        else:
+            stops = array("q", bytes(8 * capacity))
+            stops[: self.capacity] = self.stops
+            legs = array("q", bytes(8 * capacity * capacity))
+            for row in range(self.capacity):
+                legs[row * capacity : row * capacity + self.capacity] = self.legs[
+                    row * self.capacity : (row + 1) * self.capacity
+                ]
+        self.stops, self.legs, self.capacity = stops, legs, capacity
+
+    def add(self, routes: list[list[str]]) -> None:
+        """Counts the stops and legs of a batch of routes."""
+        stops, src, dst = [], [], []
+        for route in routes:
+            route = [self.intern(name) for name in route]
+            stops.extend(route)
+            src.extend(route[:-1])
+            dst.extend(route[1:])
+        if len(self.names) > self.capacity:
+            self._grow(len(self.names))
+
+        if self.numpy:
+            self.stops += numpy.bincount(stops, minlength=self.capacity)
+            numpy.add.at(self.legs, (src, dst), 1)
+        else:
+            for n in stops:
+                self.stops[n] += 1
+            for a, b in zip(src, dst, strict=True):
+                self.legs[a * self.capacity + b] += 1
+
+    def stop_counts(self) -> Counter:
+        return Counter({name: int(self.stops[n]) for n, name in enumerate(self.names) if self.stops[n]})
+
+    def leg_counts(self) -> Counter:
+        legs = Counter()
+        if self.numpy:
+            for a, b in zip(*numpy.nonzero(self.legs), strict=True):
+                legs[(self.names[a], self.names[b])] = int(self.legs[a, b])
+        else:
+            for i, cnt in enumerate(self.legs):
+                if cnt:
+                    a, b = divmod(i, self.capacity)
+                    legs[(self.names[a], self.names[b])] = cnt
+        return legs
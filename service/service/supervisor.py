@@ -0,0 +1,181 @@
+import asyncio
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from argparse import Namespace
+from collections import Counter
+
+from . import service
+from .logger import log
+
+
+class Supervisor:
+    """
+    Runs `processes` copies of the service, each in its own process
+    with its own event loop and bus driver:
+    - children share the service id (`same`) or get `<id>.<n>` (`derived`);
+      `same` needs a bus that lets several readers share a stream (see `shares_streams`)
+    - a child that fails is restarted after `RESTART_DELAY`, one that exits cleanly is not
+    - children report `Service.stats()` every `STATS_INTERVAL`, the supervisor logs the totals
+    - SIGTERM/SIGINT stop all the children together
+    """
+
+    STATS_INTERVAL = 10.0  # seconds
+    RESTART_DELAY = 1.0  # seconds
+    STOP_TIMEOUT = 5.0  # seconds
+
+    def __init__(self, config: Namespace) -> None:
+        self.config = config
+        self.processes = max(1, int(config.processes))
+        self.stats_queue = multiprocessing.Queue()
+        self.children: dict[int, multiprocessing.Process] = {}
+        self.stats: dict[int, dict] = {}
+        self.retired = Counter()  # stats of the children restarted since
+        self.restarts = Counter()
+        self.stopping = False
+        if config.process_ids == "same" and self.processes > 1 and not self.shares_streams(config):
+            raise ValueError(
+                f"--process-ids same: {self.processes} processes cannot share one `{config.bus_type}` stream, "
+                "use --process-ids derived (or a Redis `group` / NATS `jetstream` bus connection)"
+            )
+        if (
+            config.bus_type == "kafka"
+            and self.processes > 1
+            and (config.bus_connection or {}).get("group_instance_id")
+        ):
+            raise ValueError(
+                "kafka `group_instance_id` would fence the processes against each other, drop it"
+            )
+
+    @staticmethod
+    def shares_streams(config: Namespace) -> bool:
+        """
+        Whether children with the same id may read the same stream:
+        Kafka consumer groups, Postgres SKIP LOCKED, Redis consumer groups and JetStream consumers do;
+        a plain Redis stream, a core NATS subject or a shm ring (one reader) do not,
+        and the `memory`/`dummy` buses are not shared between processes at all.
+        """
+        connection = config.bus_connection or {}
+        if config.bus_type == "redis":
+            return bool(connection.get("group"))
+        if config.bus_type == "nats":
+            return bool(connection.get("jetstream"))
+        return config.bus_type in ("kafka", "pg_table")
+
+    def child_config(self, n: int) -> Namespace:
+        service_id = self.config.service_id
+        if self.config.process_ids == "derived":
+            service_id = f"{service_id}.{n}"
+        bus_connection = self.config.bus_connection
+        if self.config.bus_type == "kafka":  # static group members need one instance id per child
+            bus_connection = {**(bus_connection or {}), "instance_tag": str(n)}
+        return Namespace(
+            **{
+                **vars(self.config),
+                "service_id": service_id,
+                "processes": 1,
+                "bus_connection": bus_connection,
+            }
+        )
+
+    def spawn(self, n: int) -> None:
+        child = multiprocessing.Process(
+            target=run_child,
+            args=(self.child_config(n), n, self.stats_queue),
+            name=f"busride-{n}",
+        )
+        child.start()
+        self.children[n] = child
+        log.info("supervisor started child %s (pid=%s)", n, child.pid)
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for n in range(self.processes):
+            self.spawn(n)
+
+        reported = time.monotonic()
+        while self.children and not self.stopping:
+            self.collect_stats(timeout=self.RESTART_DELAY)
+            for n, child in list(self.children.items()):
+                if child.is_alive():
+                    continue
+                del self.children[n]
+                if child.exitcode == 0 or self.stopping:
+                    log.info("supervisor: child %s exited", n)
+                    continue
+                self.restarts[n] += 1
+                self.retired.update(self.stats.pop(n, {}))
+                log.warning("supervisor: child %s died (exitcode=%s), restarting", n, child.exitcode)
+                self.spawn(n)
+            if time.monotonic() - reported >= self.STATS_INTERVAL:
+                self.show_stats()
+                reported = time.monotonic()
+
+        self.shutdown()
+        self.collect_stats(timeout=0)
+        self.show_stats()
+
+    def stop(self, signum: int, frame: object) -> None:
+        log.info("supervisor got signal %s, stopping children", signum)
+        self.stopping = True
+
+    def shutdown(self) -> None:
+        for child in self.children.values():
+            if child.is_alive():
+                child.terminate()
+        deadline = time.monotonic() + self.STOP_TIMEOUT
+        for child in self.children.values():
+            child.join(max(0.0, deadline - time.monotonic()))
+            if child.is_alive():
+                child.kill()
+                child.join()
+        self.children = {}
+
+    def collect_stats(self, timeout: float) -> None:
+        try:
+            n, stats = self.stats_queue.get(timeout=timeout) if timeout else self.stats_queue.get_nowait()
+            self.stats[n] = stats
+            while True:
+                n, stats = self.stats_queue.get_nowait()
+                self.stats[n] = stats
+        except queue.Empty:
+            pass
+
+    def show_stats(self) -> None:
+        total = self.retired.copy()
+        for stats in self.stats.values():
+            total.update(stats)
+        log.info(
+            "supervisor: %s/%s children alive, %s restarts; totals: %s",
+            sum(child.is_alive() for child in self.children.values()),
+            self.processes,
+            sum(self.restarts.values()),
+            ", ".join(f"{k}={v}" for k, v in sorted(total.items())) or "-",
+        )
+
+
+def run_child(config: Namespace, n: int, stats_queue: multiprocessing.Queue) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the supervisor decides when to stop
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    log.info("child %s (pid=%s) running service `%s`", n, os.getpid(), config.service_id)
+    asyncio.run(child_run(config, n, stats_queue))
+
+
+async def child_run(config: Namespace, n: int, stats_queue: multiprocessing.Queue) -> None:
+    await asyncio.sleep(config.start_delay)
+    srv = service.ServiceFactory.create(config)
+
+    async def report() -> None:
+        while True:
+            await asyncio.sleep(Supervisor.STATS_INTERVAL / 2)
+            stats_queue.put((n, srv.stats()))
+
+    reporter = asyncio.create_task(report())
+    try:
+        await srv.run()
+    finally:
+        reporter.cancel()
+        stats_queue.put((n, srv.stats()))
@@ -0,0 +1,104 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing
+import time
+import zlib
+
+from .helpers import asleeq
+
+
+def burn_hash(payload: str, secs: float) -> int:
+    """Chains sha256 over the payload until `secs` of CPU time are spent."""
+    data, rounds = payload.encode("utf-8"), 0
+    deadline = time.thread_time() + secs
+    while time.thread_time() < deadline:
+        data = hashlib.sha256(data * 16).hexdigest().encode("ascii")
+        rounds += 1
+    return rounds
+
+
+def burn_compress(payload: str, secs: float) -> int:
+    """Compresses and inflates the payload until `secs` of CPU time are spent."""
+    data, rounds = payload.encode("utf-8") * 16, 0
+    deadline = time.thread_time() + secs
+    while time.thread_time() < deadline:
+        data = zlib.decompress(zlib.compress(data, 6))
+        rounds += 1
+    return rounds
+
+
+def burn_json(payload: str, secs: float) -> int:
+    """Parses, transforms and serializes a payload document until `secs` of CPU time are spent."""
+    doc = {"payload": payload, "chunks": [payload[i : i + 8] for i in range(0, len(payload), 8)]}
+    raw, rounds = json.dumps(doc), 0
+    deadline = time.thread_time() + secs
+    while time.thread_time() < deadline:
+        doc = json.loads(raw)
+        doc["chunks"] = [chunk[::-1] for chunk in reversed(doc["chunks"])]
+        doc["rounds"] = rounds
+        raw = json.dumps(doc, sort_keys=True)
+        rounds += 1
+    return rounds
+
+
+BURNERS = {
+    "hash": burn_hash,
+    "compress": burn_compress,
+    "json": burn_json,
+}
+
+
+class HardWork:
+    """
+    The work step of a stop:
+    - `sleep` profile: a random sleep around the work time, no CPU at all
+    - `hash`/`compress`/`json` profiles: burn the work time as CPU time on the payload
+    - CPU work runs `inline` (blocking the event loop), in a `thread` or a `process` pool
+    """
+
+    PROFILES = ("sleep", *BURNERS)
+    EXECUTORS = ("inline", "thread", "process")
+
+    def __init__(self, profile: str = "sleep", executor: str = "inline", pool_size: int = 0) -> None:
+        if profile not in self.PROFILES:
+            raise ValueError(f"Unknown work profile: {profile}")
+        if executor not in self.EXECUTORS:
+            raise ValueError(f"Unknown work executor: {executor}")
+        self.profile = profile
+        self.executor = executor
+        self.pool_size = int(pool_size) or None
+        self._pool: concurrent.futures.Executor | None = None
+
+    @property
+    def pool(self) -> concurrent.futures.Executor:
+        if not self._pool:
+            if self.executor == "process":
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.pool_size,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            else:
+                self._pool = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.pool_size,
+                    thread_name_prefix="hard-work",
+                )
+        return self._pool
+
+    async def __call__(self, secs: float, payload: str = "") -> None:
+        if self.profile == "sleep":
+            await asleeq(secs)
+            return
+        if secs <= 0:
+            return
+        burn = BURNERS[self.profile]
+        if self.executor == "inline":
+            burn(payload, secs)
+        else:
+            await asyncio.get_running_loop().run_in_executor(self.pool, burn, payload, secs)
+
+    def close(self) -> None:
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,43 @@
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pytest
+
+HOME_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RIDE_TIMEOUT = 60  # seconds
+
+
+def ride(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-m", "service", "--service-type", "ride", "--exit", *args],
+        cwd=HOME_PATH,
+        capture_output=True,
+        text=True,
+        timeout=RIDE_TIMEOUT,
+    )
+
+
+@pytest.mark.parametrize("workers_count", [3, 40])
+def test_shm_ride_with_workers(workers_count: int) -> None:
+    """The kicker and catcher exit early, the workers keep their peers' rings until the ride is over."""
+    prefix = f"busride-test-{os.getpid()}-{workers_count}"
+    done = ride(
+        "--bus-type",
+        "shm",
+        "--bus-connection",
+        json.dumps({"prefix": prefix}),
+        "--workers-count",
+        str(workers_count),
+        "--kick-count",
+        "20",
+        "--work-hard-time",
+        "0.01",
+    )
+    assert done.returncode == 0, done.stderr
+    assert "ride finished: 20 messages" in done.stderr
+    assert not glob.glob(f"/dev/shm/{prefix}.*")
+    assert not glob.glob(os.path.join(tempfile.gettempdir(), f"{prefix}.*.lock"))